@@ -1,31 +1,118 @@
 import argparse
-from importlib.metadata import files
+import asyncio
 import sys
 import os
-import time
 from pathlib import Path
 from dotenv import load_dotenv
 import json
+import hashlib
 from datetime import datetime
 import importlib.util  # NOUVEAU: pour détecter LangGraph
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 
-from src.agents.auditor_agent import AuditorAgent
+from src.agents.auditor_agent import AuditorAgent, BATCH_MAX_CHARS
 from src.agents.fixateur_agent import FixateurAgent
-from src.agents.testeur_agent import AgentTesteur
-from src.utils.logger import log_experiment, ActionType
+from src.agents.testeur_agent import AgentTesteur, TEST_INSTRUCTIONS
+from src.agents.combined_agent import CombinedAgent
+from src.utils.logger import (
+    buffered_log_experiment, ActionType, flush as flush_logs, start_capture, stop_capture, write_entries
+)
+from src.utils.cache import cache_load, cache_path, cache_store
+from src.utils.rate_limiter import TokenBucket
+from src.utils.tools import atomic_write, list_python_files, pylint_version, read_json, run_pylint_batch
+from src.utils.console import BANNER, RULE, log, setup_console
 
 load_dotenv()
 
 # Configuration
 DELAY_BETWEEN_REQUESTS = 10
 MAX_ITERATIONS = 5
-
-
-def create_audit_from_error_log(code_file: str):
-    """Met à jour le rapport d'audit depuis log_erreurs.json."""
+# Workers par étage (audit, correction) ; réglable sans option via LLM_CONCURRENCY
+# (chaîne convertie et validée par argparse, comme une valeur passée en option)
+CONCURRENCY = os.getenv("LLM_CONCURRENCY", "3")
+BATCH_SIZE = 1
+JOBS = 1
+
+# Gabarits du rapport d'audit mis à jour par le Testeur (construits une seule fois)
+_HEADER_TMPL = (
+    "RAPPORT D'AUDIT MIS À JOUR PAR LE TESTEUR\n"
+    "Fichier: {code_file}\n"
+    "Date: {date}\n"
+    "Agent: Testeur\n"
+    "\n"
+    "VERDICT: {verdict}\n"
+    "\n"
+    "ERREURS BLOQUANTES:\n"
+)
+_ERROR_TMPL = (
+    "\n"
+    "Erreur #{index}:\n"
+    "  Ligne: {line}\n"
+    "  Type: {type}\n"
+    "  Description: {description}\n"
+    "  Suggestion: {suggestion}\n"
+)
+
+
+async def call_agent(bucket: TokenBucket, fn, *fn_args, **fn_kwargs):
+    """Attend un jeton du limiteur puis exécute l'appel bloquant dans un thread."""
+    await bucket.acquire()
+    return await asyncio.to_thread(fn, *fn_args, **fn_kwargs)
+
+
+async def _cached_call(agent_name: str, model: str, file_path: str, fn, extra: str = "",
+                       is_valid=lambda result: True, on_hit=None, source: Optional[bytes] = None):
+    """
+    Appelle `fn()` en mémorisant son résultat sur disque.
+
+    La clé est le SHA-256 du contenu du fichier, du modèle et de `extra`
+    (prompt système, rapport d'audit...) : un fichier inchangé ne coûte
+    plus aucun appel LLM lors des exécutions suivantes.
+
+    Args:
+        agent_name: Nom de l'agent (préfixe du fichier de cache)
+        model: Modèle utilisé par l'agent
+        file_path: Fichier Python traité
+        fn: Coroutine à mémoriser (fonction sans argument)
+        extra: Contexte supplémentaire qui influence le résultat
+        is_valid: Ne met en cache que les résultats pour lesquels il renvoie True
+        on_hit: Appelé avec le résultat en cache (ex: réappliquer une correction)
+        source: Contenu du fichier déjà en mémoire (évite de le relire)
+    """
+    cache_file = cache_path(agent_name, model, file_path, extra, source)
+    result = cache_load(cache_file)
+
+    if result is not None:
+        log.info(f"✓ Résultat {agent_name} en cache : {Path(file_path).name}")
+        if on_hit:
+            await asyncio.to_thread(on_hit, result)
+        return result
+
+    result = await fn()
+    if is_valid(result):
+        await asyncio.to_thread(cache_store, cache_file, result)
+    return result
+
+
+def _errors_digest(blocking_errors) -> str:
+    """Empreinte des erreurs bloquantes (sans l'horodatage de log_erreurs.json)."""
+    payload = json.dumps(blocking_errors or [], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def create_audit_from_error_log(code_file: str, error_log: dict = None):
+    """
+    Met à jour le rapport d'audit depuis log_erreurs.json.
+
+    Args:
+        code_file: Fichier Python concerné
+        error_log: Contenu de log_erreurs.json s'il est déjà en mémoire
+            (renvoyé par le Testeur) ; sinon le fichier est relu
+    """
     try:
-        with open("log_erreurs.json", "r", encoding="utf-8") as f:
-            error_log = json.load(f)
+        if error_log is None:
+            error_log = read_json("log_erreurs.json")
         
         audit_dir = Path("audit_reports")
         audit_dir.mkdir(exist_ok=True)
@@ -33,48 +120,554 @@ def create_audit_from_error_log(code_file: str):
         audit_file = audit_dir / f"{Path(code_file).stem}_audit.txt"
         verdict = error_log.get('verdict', 'ERREUR BLOQUANTE – correction requise')
         
-        audit_content = f"""RAPPORT D'AUDIT MIS À JOUR PAR LE TESTEUR
-Fichier: {code_file}
-Date: {error_log.get('timestamp', datetime.now().isoformat())}
-Agent: Testeur
-
-VERDICT: {verdict}
-
-ERREURS BLOQUANTES:
-"""
+        parts = [_HEADER_TMPL.format(
+            code_file=code_file,
+            date=error_log.get('timestamp', datetime.now().isoformat()),
+            verdict=verdict
+        )]
         
         blocking_errors = error_log.get('blocking_errors', [])
         
         if not blocking_errors:
-            audit_content += "\nAucune erreur bloquante.\n"
+            parts.append("\nAucune erreur bloquante.\n")
         else:
             for i, error in enumerate(blocking_errors, 1):
-                audit_content += f"""
-Erreur #{i}:
-  Ligne: {error.get('line', 'N/A')}
-  Type: {error.get('type', 'Unknown')}
-  Description: {error.get('description', '')}
-  Suggestion: {error.get('suggestion', '')}
-"""
+                parts.append(_ERROR_TMPL.format(
+                    index=i,
+                    line=error.get('line', 'N/A'),
+                    type=error.get('type', 'Unknown'),
+                    description=error.get('description', ''),
+                    suggestion=error.get('suggestion', '')
+                ))
         
-        with open(audit_file, "w", encoding="utf-8") as f:
-            f.write(audit_content)
+        # Un seul assemblage final plutôt que des += successifs (copie quadratique)
+        atomic_write(audit_file, "".join(parts))
         
-        print(f"  ✓ Rapport d'audit mis à jour: {audit_file}")
+        log.info(f"  ✓ Rapport d'audit mis à jour: {audit_file}")
         return True
         
     except Exception as e:
-        print(f"  ⚠️  Erreur mise à jour audit: {e}")
+        log.warning(f"  ⚠️  Erreur mise à jour audit: {e}")
         return False
 
 
+async def run_pipeline(python_files, auditor, fixateur, testeur, reports_dir: Path, args,
+                       combined=None) -> dict:
+    """
+    Traite tous les fichiers en pipeline à trois étages (audit → correction → test).
+
+    Chaque étage a sa file (asyncio.Queue) et ses workers : pendant que le
+    fichier N est testé, le fichier N+1 est corrigé et le N+2 audité. Un test
+    en échec renvoie le fichier dans la file de correction (self-healing).
+
+    Les appels aux agents sont bloquants (API LLM) : ils sont exécutés dans des
+    threads via asyncio.to_thread. L'audit et la correction ont chacun
+    `args.concurrency` workers ; le test n'en a qu'un, car le Testeur réécrit
+    des fichiers partagés (log_erreurs.json, test_logs.jsonl). Le débit de chaque
+    agent est limité par un seau à jetons (AUDITOR_RPM, FIXATEUR_RPM, TESTEUR_RPM).
+
+    Avec `combined` (--combined), l'étage d'audit demande le plan et le code
+    corrigé en une seule requête et envoie directement le fichier au test ;
+    si la réponse est inexploitable, le fichier suit le circuit normal.
+
+    Returns:
+        Les statistiques agrégées de l'exécution
+    """
+    total_files = len(python_files)
+    stats = {
+        "total": total_files,
+        "validated": 0,
+        "failed": 0,
+        "total_iterations": 0,
+        "first_try": 0,
+        "needed_selfhealing": 0
+    }
+    results = {}
+    batched_plans = {}
+    # Chaque fichier est lu une seule fois : les agents reçoivent ce contenu
+    # au lieu de relire le disque à chaque audit, correction et test
+    # (un fichier illisible est compté en échec, sans interrompre les autres)
+    sources = {}
+    unreadable = []
+    for file_path in python_files:
+        try:
+            sources[str(file_path)] = file_path.read_bytes()
+        except OSError as e:
+            log.warning(f"✗ Lecture impossible de {file_path}: {e}")
+            unreadable.append(file_path)
+    pylint_reports = {}
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    auditor_bucket = TokenBucket.from_env("auditor", workers=args.jobs)
+    fixateur_bucket = TokenBucket.from_env("fixateur", workers=args.jobs)
+    testeur_bucket = TokenBucket.from_env("testeur", workers=args.jobs)
+    # Contexte de la clé de cache d'audit : le rapport Pylint fait partie du
+    # prompt, un changement de version de pylint invalide donc les audits
+    audit_extra = "" if args.no_cache else auditor.system_prompt + pylint_version()
+    combined_extra = "" if args.no_cache or combined is None else combined.system_prompt + pylint_version()
+
+    audit_q = asyncio.Queue()
+    fix_q = asyncio.Queue()
+    test_q = asyncio.Queue()
+    # Files et nombre de workers de chaque étage (sentinelles envoyées par finish)
+    stages = [(audit_q, args.concurrency), (fix_q, args.concurrency), (test_q, 1)]
+    finished = 0
+
+    def finish(job: dict, validated: bool):
+        """Clôt un fichier ; le dernier envoie une sentinelle à chaque worker."""
+        nonlocal finished
+        stats["validated" if validated else "failed"] += 1
+        finished += 1
+        if finished == total_files:
+            for queue, workers in stages:
+                for _ in range(workers):
+                    queue.put_nowait(None)
+
+    # ================================================================
+    # ÉTAGE 1 (--combined): AUDIT + CORRECTION EN UNE REQUÊTE
+    # ================================================================
+    async def combined_stage(job: dict) -> bool:
+        """Retourne False si la réponse est inexploitable (repli sur l'audit normal)."""
+        fpath_str = job["fpath_str"]
+        report_file = job["report_file"]
+
+        def apply(result):
+            # Résultat en cache : réécrire le rapport et le code corrigé
+            atomic_write(report_file, result["plan"])
+            atomic_write(job["path"], result["fixed_code"])
+
+        call = lambda: call_agent(
+            auditor_bucket, combined.audit_and_fix, fpath_str,
+            content=job_text(job), pylint_report=pylint_reports.get(fpath_str),
+            report_file=report_file
+        )
+
+        try:
+            if args.no_cache:
+                result = await call()
+            else:
+                result = await _cached_call(
+                    "combined", combined.model_name, fpath_str, call,
+                    extra=combined_extra,
+                    is_valid=lambda result: result.get("status") == "success",
+                    on_hit=apply,
+                    source=job["source"]
+                )
+        except Exception as e:
+            result = {"status": "error", "message": str(e)}
+
+        if result.get("status") != "success":
+            log.warning(f"⚠️  Audit+correction combinés inexploitables ({job['path'].name}), repli sur les agents séparés")
+            return False
+
+        log.info(f"✓ Audit et correction appliqués : {job['path'].name}")
+        results[fpath_str] = report_file
+        job["source"] = result["fixed_code"].encode("utf-8")
+        await test_q.put(job)
+        return True
+
+    # ================================================================
+    # ÉTAGE 1: AUDIT
+    # ================================================================
+    async def audit_stage(job: dict):
+        fpath_str = job["fpath_str"]
+
+        # Un seul message par bloc : les workers parallèles ne s'entremêlent pas
+        log.info("\n".join([
+            f"\n{BANNER}",
+            f"FICHIER [{job['index']}/{total_files}] : {job['path'].name}",
+            BANNER,
+            "\n📋 PHASE 1: AUDIT",
+            RULE,
+        ]))
+
+        if combined is not None and await combined_stage(job):
+            return
+
+        try:
+            report_file = job["report_file"]
+            write_report = lambda plan: atomic_write(report_file, str(plan))
+
+            # L'Auditeur écrit lui-même le rapport pendant la génération ; les
+            # plans venant d'un lot ou du cache sont écrits ici. Écriture dans un
+            # thread, attendue car le Fixateur relit ce rapport.
+            if fpath_str in batched_plans:
+                plan = batched_plans.pop(fpath_str)
+                await asyncio.to_thread(write_report, plan)
+            elif args.no_cache:
+                plan = await call_agent(
+                    auditor_bucket, auditor.audit, fpath_str,
+                    content=job_text(job), pylint_report=pylint_reports.get(fpath_str),
+                    report_file=report_file
+                )
+            else:
+                plan = await _cached_call(
+                    "audit", auditor.model_name, fpath_str,
+                    lambda: call_agent(
+                        auditor_bucket, auditor.audit, fpath_str,
+                        content=job_text(job), pylint_report=pylint_reports.get(fpath_str),
+                        report_file=report_file
+                    ),
+                    extra=audit_extra,
+                    is_valid=lambda plan: not plan.startswith("Erreur Auditeur"),
+                    on_hit=write_report,
+                    source=job["source"]
+                )
+            log.info(f"✓ Audit terminé : {job['path'].name}")
+
+            # Seul le chemin est conservé : le plan complet est déjà sur disque
+            results[fpath_str] = report_file
+
+        except Exception as e:
+            log.warning(f"✗ Erreur audit: {e}")
+            finish(job, validated=False)
+            return
+
+        await fix_q.put(job)
+
+    # ================================================================
+    # ÉTAGE 2: CORRECTION (initiale ou self-healing)
+    # ================================================================
+    async def fix_stage(job: dict):
+        fpath_str = job["fpath_str"]
+
+        try:
+            if job["iteration"] == 0:
+                log.info(f"\n🔧 PHASE 2: CORRECTION\n{RULE}")
+
+                if args.no_cache:
+                    result = await call_agent(fixateur_bucket, fixateur.fix, fpath_str, content=job_text(job))
+                else:
+                    result = await _cached_call(
+                        "fix", fixateur.model_name, fpath_str,
+                        lambda: call_agent(fixateur_bucket, fixateur.fix, fpath_str, content=job_text(job)),
+                        extra=fixateur.system_prompt + job["report_file"].read_text(encoding="utf-8"),
+                        is_valid=lambda result: result.get("status") == "success",
+                        on_hit=lambda result: atomic_write(job["path"], result["fixed_code"]),
+                        source=job["source"]
+                    )
+            else:
+                log.info("\n".join([
+                    f"\n{BANNER}",
+                    f"🔄 SELF-HEALING - ITÉRATION {job['iteration']}/{args.max_iterations}",
+                    BANNER,
+                    "\n🔧 RE-CORRECTION",
+                    RULE,
+                ]))
+
+                # Seules les erreurs du dernier test sont renvoyées au Fixateur
+                result = await call_agent(
+                    fixateur_bucket, fixateur.fix, fpath_str,
+                    incremental_errors=job["validation"].get("blocking_errors"),
+                    content=job_text(job)
+                )
+
+            if result.get("status") != "success":
+                log.warning(f"✗ Correction échouée : {job['path'].name}")
+                finish(job, validated=False)
+                return
+
+            log.info(f"✓ Correction appliquée : {job['path'].name}")
+            # Le Fixateur vient d'écrire ce code : la copie en mémoire reste à jour
+            job["source"] = result["fixed_code"].encode("utf-8")
+
+        except Exception as e:
+            log.warning(f"✗ Erreur correction: {e}")
+            finish(job, validated=False)
+            return
+
+        await test_q.put(job)
+
+    # ================================================================
+    # ÉTAGE 3: TEST → validé, échec, ou retour vers la correction
+    # ================================================================
+    async def test_stage(job: dict):
+        fpath_str = job["fpath_str"]
+        iteration = job["iteration"]
+
+        log.info(f"\n{'🧪 PHASE 3: TEST' if iteration == 0 else '🧪 RE-TEST'}\n{RULE}")
+
+        try:
+            if args.no_cache:
+                validation = await call_agent(
+                    testeur_bucket, testeur.run_full_test_cycle, fpath_str, content=job_text(job)
+                )
+            else:
+                # Seuls les verdicts OK sont mémorisés : un code déjà validé n'est
+                # plus renvoyé au modèle, un échec est toujours réévalué
+                validation = await _cached_call(
+                    "test", testeur.model_name, fpath_str,
+                    lambda: call_agent(
+                        testeur_bucket, testeur.run_full_test_cycle, fpath_str, content=job_text(job)
+                    ),
+                    extra=testeur.system_prompt + TEST_INSTRUCTIONS,
+                    is_valid=lambda validation: validation.get("status") == "SUCCESS",
+                    source=job["source"]
+                )
+
+            if validation.get("error_log"):
+                # Mettre à jour le rapport d'audit
+                await asyncio.to_thread(
+                    create_audit_from_error_log, fpath_str, error_log=validation["error_log"]
+                )
+        except Exception as e:
+            log.warning(f"✗ Erreur test: {e}")
+            finish(job, validated=False)
+            return
+
+        if iteration == 0:
+            stats["total_iterations"] += 1
+
+        if validation['status'] == 'SUCCESS':
+            if iteration == 0:
+                log.info(f"\n✅ OK – exécution valide (du premier coup)")
+                stats["first_try"] += 1
+            else:
+                log.info(f"\n✅ OK – exécution valide")
+                log.info(f"   Self-healing réussi en {iteration + 1} itération(s) totale(s)")
+            finish(job, validated=True)
+            return
+
+        digest = _errors_digest(validation.get("blocking_errors"))
+
+        if iteration == 0:
+            log.warning(f"\n⚠️  ERREUR BLOQUANTE détectée")
+            log.info(f"🔄 Activation du SELF-HEALING...")
+            stats["needed_selfhealing"] += 1
+        else:
+            log.warning(f"\n⚠️  Erreurs persistent (itération {iteration})")
+
+            # Mêmes erreurs que l'itération précédente : le Fixateur ne
+            # converge pas, inutile de payer une nouvelle correction
+            if digest == job["previous_digest"]:
+                log.info(f"\n⏹️  Fixateur bloqué sur les mêmes erreurs – arrêt du self-healing")
+                finish(job, validated=False)
+                return
+
+        if iteration >= args.max_iterations:
+            log.warning(f"\n❌ Échec après {args.max_iterations} itérations")
+            finish(job, validated=False)
+            return
+
+        job["iteration"] = iteration + 1
+        job["validation"] = validation
+        job["previous_digest"] = digest
+        stats["total_iterations"] += 1
+        await fix_q.put(job)
+
+    def job_text(job: dict) -> str:
+        return job["source"].decode("utf-8")
+
+    async def worker(queue: asyncio.Queue, stage):
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            try:
+                await stage(job)
+            except Exception as e:
+                log.warning(f"✗ Erreur inattendue sur {job['fpath_str']}: {e}")
+                finish(job, validated=False)
+
+    async def audit_chunk(chunk):
+        try:
+            async with semaphore:
+                plans = await call_agent(
+                    auditor_bucket, auditor.audit_batch, [str(p) for p in chunk],
+                    contents={str(p): sources[str(p)].decode("utf-8") for p in chunk},
+                    pylint_reports=pylint_reports
+                )
+            batched_plans.update(plans)
+            if not args.no_cache:
+                await asyncio.gather(*(
+                    asyncio.to_thread(
+                        cache_store,
+                        cache_path("audit", auditor.model_name, path, audit_extra, sources[path]),
+                        plan
+                    )
+                    for path, plan in plans.items()
+                ))
+            log.info(f"✓ Audit groupé : {len(plans)}/{len(chunk)} fichier(s)")
+        except Exception as e:
+            log.warning(f"✗ Erreur audit groupé: {e}")
+        finally:
+            # Les fichiers du lot entrent dans le pipeline dès que leur lot est
+            # audité, sans attendre les autres lots ; ceux absents de la
+            # réponse sont audités individuellement par l'étage d'audit
+            for file_path in chunk:
+                await audit_q.put(jobs[str(file_path)])
+
+    if not python_files:
+        return stats
+
+    jobs = {
+        str(file_path): {
+            "index": index,
+            "path": file_path,
+            # Calculés une fois, réutilisés dans tous les appels et messages
+            "fpath_str": str(file_path),
+            "source": sources[str(file_path)],
+            "report_file": reports_dir / f"{file_path.stem}_audit.txt",
+            "iteration": 0,
+            "validation": None,
+            "previous_digest": None,
+        }
+        for index, file_path in enumerate(python_files, start=1)
+        if str(file_path) in sources
+    }
+    for file_path in unreadable:
+        finish({"fpath_str": str(file_path)}, validated=False)
+    python_files = [p for p in python_files if str(p) in sources]
+
+    # Fichiers à auditer réellement (hors cache)
+    if combined is None:
+        cache_kind, cache_model, cache_extra = "audit", auditor.model_name, audit_extra
+    else:
+        cache_kind, cache_model, cache_extra = "combined", combined.model_name, combined_extra
+    pending = [
+        p for p in python_files
+        if args.no_cache
+        or not cache_path(cache_kind, cache_model, str(p), cache_extra, sources[str(p)]).exists()
+    ]
+
+    # Un seul lancement de pylint pour tous ces fichiers au lieu d'un par audit
+    pylint_reports.update(await asyncio.to_thread(run_pylint_batch, [str(p) for p in pending]))
+
+    # Audits groupés : plusieurs petits fichiers par requête. Les fichiers déjà
+    # en cache et les lots trop gros sont audités un par un. Sans objet avec
+    # --combined, qui fait déjà audit et correction en une requête.
+    chunks = []
+    if args.batch_size > 1 and combined is None:
+        chunks = [
+            chunk for chunk in (pending[i:i + args.batch_size] for i in range(0, len(pending), args.batch_size))
+            if len(chunk) > 1 and sum(len(sources[str(p)]) for p in chunk) <= BATCH_MAX_CHARS
+        ]
+    in_chunks = {str(p) for chunk in chunks for p in chunk}
+
+    for fpath_str, job in jobs.items():
+        if fpath_str not in in_chunks:
+            audit_q.put_nowait(job)
+
+    await asyncio.gather(
+        *(audit_chunk(chunk) for chunk in chunks),
+        *(worker(audit_q, audit_stage) for _ in range(args.concurrency)),
+        *(worker(fix_q, fix_stage) for _ in range(args.concurrency)),
+        worker(test_q, test_stage),
+    )
+    return stats
+
+
+def positive_int(value: str) -> int:
+    """Type argparse : entier >= 1 (sinon message d'erreur propre, sans traceback)."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"entier attendu, reçu '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"doit être >= 1, reçu {number}")
+    return number
+
+
+def _run_worker(python_files, args):
+    """
+    Point d'entrée d'un processus du pool --jobs : traite sa part des fichiers
+    avec ses propres agents (client Gemini, prompts chargés une seule fois).
+
+    Returns:
+        (statistiques, entrées de log à écrire par le processus principal)
+    """
+    start_capture()
+    setup_console(verbose=args.verbose, quiet=args.quiet)
+
+    auditor = AuditorAgent()
+    fixateur = FixateurAgent()
+    testeur = AgentTesteur()
+    combined = CombinedAgent() if args.combined else None
+    stats = asyncio.run(
+        run_pipeline(python_files, auditor, fixateur, testeur, Path("audit_reports"), args, combined)
+    )
+    # Les processus du pool ne passent pas par atexit : vider les logs du Testeur ici
+    testeur.close()
+    return stats, stop_capture()
+
+
+def run_parallel(python_files, args) -> dict:
+    """
+    Répartit les fichiers entre `args.jobs` processus et agrège leurs statistiques.
+
+    Chaque processus a son propre pipeline et une part du quota *_RPM. Seul le
+    processus principal écrit logs/experiment_data.json.
+    """
+    # Répartition alternée : les fichiers étant triés par taille, chaque
+    # processus reçoit des gros et des petits fichiers
+    shares = [python_files[i::args.jobs] for i in range(args.jobs)]
+    shares = [share for share in shares if share]
+
+    # Les entrées en attente sont écrites avant le fork : sinon chaque
+    # processus en hérite une copie et les renvoie au parent
+    flush_logs()
+
+    stats = {}
+    with ProcessPoolExecutor(max_workers=len(shares)) as executor:
+        for worker_stats, entries in executor.map(_run_worker, shares, [args] * len(shares)):
+            write_entries(entries)
+            for key, value in worker_stats.items():
+                stats[key] = stats.get(key, 0) + value
+    return stats
+
+
+def render_final_report(stats: dict, quiet: bool = False) -> str:
+    """Assemble le rapport final en une seule chaîne (une seule écriture sur stdout)."""
+    separator = "" if quiet else BANNER
+    return "\n".join([
+        f"\n{separator}",
+        "📊 RAPPORT FINAL",
+        separator,
+        f"Fichiers traités : {stats['total']}",
+        f"✅ Validés : {stats['validated']}",
+        f"❌ Échecs : {stats['failed']}",
+        f"⚡ Réussis du premier coup : {stats['first_try']}",
+        f"🔄 Nécessitant self-healing : {stats['needed_selfhealing']}",
+        f"📈 Total itérations : {stats['total_iterations']}",
+        f"📊 Moyenne itérations/fichier : {stats['total_iterations']/stats['total']:.1f}",
+        separator,
+    ]) + "\n"
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Refactoring Swarm - Analyse automatique de code Python"
     )
     parser.add_argument("--target_dir", type=str, required=True)
-    parser.add_argument("--delay", type=int, default=DELAY_BETWEEN_REQUESTS)
+    parser.add_argument(
+        "--delay",
+        type=int,
+        default=DELAY_BETWEEN_REQUESTS,
+        help="Délai entre fichiers en mode LangGraph (le mode classique utilise *_RPM)"
+    )
     parser.add_argument("--max-iterations", type=int, default=MAX_ITERATIONS)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="Nombre de petits fichiers audités par requête (1 = un fichier par requête)"
+    )
+    parser.add_argument(
+        "--combined",
+        action="store_true",
+        help="Audit et correction initiale en une seule requête par fichier"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore le cache des audits/corrections (.cache/)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=positive_int,
+        default=CONCURRENCY,
+        help="Nombre de workers des étages audit et correction du pipeline (défaut : LLM_CONCURRENCY ou 3)"
+    )
     # NOUVEAU: Ajout du paramètre mode
     parser.add_argument(
         "--mode",
@@ -83,18 +676,37 @@ def main():
         default="classic",
         help="Mode d'exécution: auto (détection), langgraph, classic"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=JOBS,
+        help="Nombre de processus se partageant les fichiers (les quotas *_RPM sont répartis entre eux)"
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Affiche la progression détaillée de chaque fichier"
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Supprime les lignes de séparation (utile en CI)"
+    )
     args = parser.parse_args()
+    setup_console(verbose=args.verbose, quiet=args.quiet)
 
-    if not os.path.exists(args.target_dir):
+    if not os.path.isdir(args.target_dir):
         print(f"Erreur: Dossier {args.target_dir} introuvable.")
         sys.exit(1)
 
     print(f"DEMARRAGE SUR : {args.target_dir}")
-    print(f"Délai entre fichiers : {args.delay} secondes")
-    print(f"Itérations self-healing max : {args.max_iterations}")
-    print(f"Mode : {args.mode}\n")
+    log.info(f"Délai entre fichiers : {args.delay} secondes")
+    log.info(f"Itérations self-healing max : {args.max_iterations}")
+    log.info(f"Fichiers en parallèle : {args.concurrency}")
+    log.info(f"Processus : {args.jobs}")
+    log.info(f"Mode : {args.mode}\n")
 
-    log_experiment(
+    buffered_log_experiment(
         agent_name="System",
         model_used="N/A",
         action=ActionType.ANALYSIS,
@@ -102,6 +714,9 @@ def main():
             "target_dir": args.target_dir,
             "delay_seconds": args.delay,
             "max_iterations": args.max_iterations,
+            "concurrency": args.concurrency,
+            "jobs": args.jobs,
+            "combined": args.combined,
             "mode": args.mode,
             "input_prompt": f"Scan du dossier {args.target_dir}",
             "output_response": "Démarrage du système"
@@ -120,9 +735,9 @@ def main():
         use_langgraph = langgraph_spec is not None
         
         if use_langgraph:
-            print("✓ LangGraph détecté - utilisation du mode optimisé")
+            log.info("✓ LangGraph détecté - utilisation du mode optimisé")
         else:
-            print("ℹ️ LangGraph non installé - utilisation du mode classique")
+            log.info("ℹ️ LangGraph non installé - utilisation du mode classique")
     
     if use_langgraph:
         try:
@@ -137,19 +752,20 @@ def main():
             sys.exit(exit_code)
             
         except Exception as e:
-            print(f"❌ Erreur avec LangGraph: {e}")
-            print("🔄 Bascule en mode classique...\n")
+            log.warning(f"❌ Erreur avec LangGraph: {e}")
+            log.info("🔄 Bascule en mode classique...\n")
             # Continue avec le mode classique
     
     # ===== VOTRE CODE EXISTANT (mode classique) =====
-    target_path = Path(args.target_dir)
-    python_files = list(target_path.glob("*.py"))
+    # Les plus gros fichiers d'abord : leur prompt amorce le cache de préfixe du
+    # fournisseur, les suivants réutilisent le même préfixe (prompt système + consignes)
+    python_files = sorted(list_python_files(args.target_dir), key=lambda p: p.stat().st_size, reverse=True)
 
     if not python_files:
-        print(f"Aucun fichier Python trouvé dans {args.target_dir}")
+        log.info(f"Aucun fichier Python trouvé dans {args.target_dir}")
         sys.exit(0)
 
-    print(f"Fichiers Python trouvés : {len(python_files)}\n")
+    log.info(f"Fichiers Python trouvés : {len(python_files)}\n")
 
     reports_dir = Path("audit_reports")
     reports_dir.mkdir(exist_ok=True)
@@ -157,217 +773,54 @@ def main():
     # Initialisation agents
     try:
         auditor = AuditorAgent()
-        print(f"Auditor Agent initialisé : {auditor.model_name}\n")
+        log.info(f"Auditor Agent initialisé : {auditor.model_name}\n")
     except Exception as e:
-        print(f"Erreur initialisation Auditor : {e}")
+        log.error(f"Erreur initialisation Auditor : {e}")
         sys.exit(1)
 
     try:
         fixateur = FixateurAgent()
-        print(f"Fixateur Agent initialisé : {fixateur.model_name}\n")
+        log.info(f"Fixateur Agent initialisé : {fixateur.model_name}\n")
     except Exception as e:
-        print(f"Erreur initialisation Fixateur : {e}")
+        log.error(f"Erreur initialisation Fixateur : {e}")
         sys.exit(1)
 
     try:
         testeur = AgentTesteur()
-        print(f"Testeur Agent initialisé : {testeur.model_name}\n")
+        log.info(f"Testeur Agent initialisé : {testeur.model_name}\n")
     except Exception as e:
-        print(f"Erreur initialisation Testeur : {e}")
+        log.error(f"Erreur initialisation Testeur : {e}")
         sys.exit(1)
 
-    # Statistiques
-    total_files = len(python_files)
-    stats = {
-        "total": total_files,
-        "validated": 0,
-        "failed": 0,
-        "total_iterations": 0,
-        "first_try": 0,
-        "needed_selfhealing": 0
-    }
-
-    # ====================================================================
-    # TRAITEMENT DE CHAQUE FICHIER
-    # ====================================================================
-    results = {}
-    
-    for index, file_path in enumerate(python_files, start=1):
-        print("\n" + "=" * 70)
-        print(f"FICHIER [{index}/{total_files}] : {file_path.name}")
-        print("=" * 70)
-
-        # ================================================================
-        # PHASE 1: AUDIT
-        # ================================================================
-        print(f"\n📋 PHASE 1: AUDIT")
-        print("-" * 70)
-        
+    combined = None
+    if args.combined:
         try:
-            plan = auditor.audit(str(file_path))
-            results[str(file_path)] = plan
-            print(f"✓ Audit terminé")
-
-            report_file = reports_dir / f"{file_path.stem}_audit.txt"
-            with open(report_file, "w", encoding="utf-8") as f:
-                f.write(str(plan))
-
+            combined = CombinedAgent()
+            log.info(f"Agent combiné (audit + correction) initialisé : {combined.model_name}\n")
         except Exception as e:
-            print(f"✗ Erreur audit: {e}")
-            stats["failed"] += 1
-            if index < total_files:
-                time.sleep(args.delay)
-            continue
-
-        # ================================================================
-        # PHASE 2: CORRECTION INITIALE
-        # ================================================================
-        print(f"\n🔧 PHASE 2: CORRECTION")
-        print("-" * 70)
-        
-        try:
-            result = fixateur.fix(str(file_path))
-            
-            if result.get("status") != "success":
-                print(f"✗ Correction échouée")
-                stats["failed"] += 1
-                if index < total_files:
-                    time.sleep(args.delay)
-                continue
-            
-            print(f"✓ Correction appliquée")
+            log.error(f"Erreur initialisation Agent combiné : {e}")
+            sys.exit(1)
 
-        except Exception as e:
-            print(f"✗ Erreur correction: {e}")
-            stats["failed"] += 1
-            if index < total_files:
-                time.sleep(args.delay)
-            continue
-
-        # ================================================================
-        # PHASE 3: TEST INITIAL
-        # ================================================================
-        print(f"\n🧪 PHASE 3: TEST")
-        print("-" * 70)
-        
+    # Statistiques
+    total_files = len(python_files)
+    if args.jobs > 1:
+        # Les agents ci-dessus ont validé la configuration ; chaque processus crée les siens
         try:
-            validation = testeur.run_full_test_cycle(str(file_path))
-            stats["total_iterations"] += 1
-            
-            # ============================================================
-            # DÉCISION: SUCCESS ou SELF-HEALING ?
-            # ============================================================
-            
-            if validation['status'] == 'SUCCESS':
-                # ✅ SUCCÈS DU PREMIER COUP - PAS DE SELF-HEALING
-                print(f"\n✅ OK – exécution valide (du premier coup)")
-                stats["validated"] += 1
-                stats["first_try"] += 1
-                
-                # Pas de self-healing nécessaire, passer au fichier suivant
-                if index < total_files:
-                    print(f"\n⏳ Attente {args.delay}s...")
-                    time.sleep(args.delay)
-                continue
-            
-            else:
-                # ❌ ÉCHEC - ENTRER DANS LA BOUCLE SELF-HEALING
-                print(f"\n⚠️  ERREUR BLOQUANTE détectée")
-                print(f"🔄 Activation du SELF-HEALING...")
-                
-                stats["needed_selfhealing"] += 1
-                
-                # Mettre à jour le rapport d'audit
-                if Path("log_erreurs.json").exists():
-                    create_audit_from_error_log(str(file_path))
-                
-                # ========================================================
-                # BOUCLE SELF-HEALING
-                # ========================================================
-                validated = False
-                
-                for iteration in range(1, args.max_iterations + 1):
-                    print(f"\n{'='*70}")
-                    print(f"🔄 SELF-HEALING - ITÉRATION {iteration}/{args.max_iterations}")
-                    print(f"{'='*70}")
-                    
-                    stats["total_iterations"] += 1
-                    
-                    # RE-CORRECTION
-                    print(f"\n🔧 RE-CORRECTION")
-                    print("-" * 70)
-                    
-                    try:
-                        fix_result = fixateur.fix(str(file_path))
-                        
-                        if fix_result.get("status") != "success":
-                            print(f"✗ Re-correction échouée")
-                            break
-                        
-                        print(f"✓ Re-correction appliquée")
-                        
-                    except Exception as e:
-                        print(f"✗ Erreur re-correction: {e}")
-                        break
-                    
-                    # RE-TEST
-                    print(f"\n🧪 RE-TEST")
-                    print("-" * 70)
-                    
-                    try:
-                        validation = testeur.run_full_test_cycle(str(file_path))
-                        
-                        if validation['status'] == 'SUCCESS':
-                            print(f"\n✅ OK – exécution valide")
-                            print(f"   Self-healing réussi en {iteration + 1} itération(s) totale(s)")
-                            validated = True
-                            stats["validated"] += 1
-                            break  # SORTIR de la boucle self-healing
-                        
-                        else:
-                            print(f"\n⚠️  Erreurs persistent (itération {iteration})")
-                            
-                            # Mettre à jour l'audit pour la prochaine itération
-                            if Path("log_erreurs.json").exists():
-                                create_audit_from_error_log(str(file_path))
-                            
-                            if iteration >= args.max_iterations:
-                                print(f"\n❌ Échec après {args.max_iterations} itérations")
-                                break
-                        
-                    except Exception as e:
-                        print(f"✗ Erreur test: {e}")
-                        break
-                
-                # Si toujours pas validé après self-healing
-                if not validated:
-                    stats["failed"] += 1
-        
+            stats = run_parallel(python_files, args)
         except Exception as e:
-            print(f"✗ Erreur test initial: {e}")
-            stats["failed"] += 1
-        
-        # Délai avant fichier suivant
-        if index < total_files:
-            print(f"\n⏳ Attente {args.delay}s...")
-            time.sleep(args.delay)
+            log.error(f"Erreur dans un processus --jobs : {e}")
+            sys.exit(1)
+    else:
+        stats = asyncio.run(
+            run_pipeline(python_files, auditor, fixateur, testeur, reports_dir, args, combined)
+        )
 
     # ====================================================================
     # RAPPORT FINAL
     # ====================================================================
-    print("\n" + "=" * 70)
-    print("📊 RAPPORT FINAL")
-    print("=" * 70)
-    print(f"Fichiers traités : {stats['total']}")
-    print(f"✅ Validés : {stats['validated']}")
-    print(f"❌ Échecs : {stats['failed']}")
-    print(f"⚡ Réussis du premier coup : {stats['first_try']}")
-    print(f"🔄 Nécessitant self-healing : {stats['needed_selfhealing']}")
-    print(f"📈 Total itérations : {stats['total_iterations']}")
-    print(f"📊 Moyenne itérations/fichier : {stats['total_iterations']/stats['total']:.1f}")
-    print("=" * 70)
-
-    log_experiment(
+    sys.stdout.write(render_final_report(stats, args.quiet))
+
+    buffered_log_experiment(
         agent_name="System",
         model_used="N/A",
         action=ActionType.ANALYSIS,
@@ -386,6 +839,7 @@ def main():
     )
 
     print("\nMISSION_COMPLETE")
+    sys.stdout.flush()
     sys.exit(0 if stats["failed"] == 0 else 1)
 
 
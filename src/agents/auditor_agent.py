@@ -1,15 +1,32 @@
+import json
 import os
-import google.generativeai as genai
+from pathlib import Path
+from typing import Dict, List, Optional
+
 from dotenv import load_dotenv
 
-from src.utils.tools import run_pylint, read_file
-from src.utils.logger import log_experiment, ActionType
+from src.utils.tools import run_pylint, read_file, load_prompt, atomic_open, atomic_write
+from src.utils.logger import buffered_log_experiment, ActionType
+from src.utils.gemini_client import get_model
 
 load_dotenv()
 
 # Définition de modèle, remarque si vous trouverez de problèmes de quota remplacez gemini-2.5-flash par gemma-3-27b-it
 DEFAULT_MODEL = "gemma-3-27b-it"  
 
+# Consignes fixes : placées AVANT le contenu variable pour que le début du prompt
+# soit identique d'un fichier à l'autre (mise en cache du préfixe par le fournisseur)
+AUDIT_INSTRUCTIONS = (
+    "Génère un plan de refactoring détaillé basé sur :\n"
+    "1. Les problèmes identifiés par Pylint\n"
+    "2. Les bugs logiques potentiels que tu détectes dans le code\n"
+    "3. Les problèmes de sécurité (division par zéro, fichiers non fermés, etc.)\n"
+    "4. Les violations des bonnes pratiques Python"
+)
+
+# Au-delà, un lot de fichiers risque de dépasser le contexte / quota de tokens du modèle
+BATCH_MAX_CHARS = 24000
+
 class AuditorAgent:
     """
     Agent Auditeur :
@@ -31,43 +48,47 @@ class AuditorAgent:
         if not api_key:
             raise EnvironmentError("GOOGLE_API_KEY manquante dans le fichier .env")
 
-        # Configuration Gemini
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name=model_name)
+        # Modèle Gemini partagé entre agents (une seule configuration, client réutilisé)
+        self.model = get_model(api_key, model_name)
 
         self.name = "Auditor"
         self.model_name = model_name
-        self.system_prompt = read_file("prompts/auditor_system.txt")
+        self.system_prompt = load_prompt("auditor_system.txt")
 
-    def audit(self, file_path: str) -> str:
+    def audit(self, file_path: str, content: Optional[str] = None,
+              pylint_report: Optional[str] = None, report_file: Optional[Path] = None) -> str:
             """
             Analyse un fichier Python et génère un plan de refactoring complet.
             
             Args:
                 file_path: Chemin vers le fichier Python à analyser
+                content: Code source déjà en mémoire (évite de relire le fichier)
+                pylint_report: Rapport Pylint déjà calculé (ex: run_pylint_batch)
+                report_file: Si fourni, la réponse est reçue en streaming et écrite
+                    dans ce fichier au fur et à mesure (le plan, ou le message
+                    d'erreur en cas d'échec)
                 
             Returns:
                 Plan de refactoring détaillé en Markdown
             """
             try:
                 # 1. Lecture du code source
-                code_content = read_file(file_path)
+                code_content = content if content is not None else read_file(file_path)
                 
                 # 2. Analyse statique du fichier Python
-                pylint_report = run_pylint(file_path)
+                if pylint_report is None:
+                    pylint_report = run_pylint(file_path)
 
-                # 3. Prépare le contenu utilisateur (code + rapport Pylint)
+                # 3. Prépare le contenu utilisateur : consignes fixes d'abord,
+                #    puis uniquement ce qui varie (chemin, code, rapport Pylint)
                 user_content = (
+                    f"{AUDIT_INSTRUCTIONS}\n\n"
+                    "FILE CONTENT:\n"
                     f"Fichier analysé : {file_path}\n\n"
                     f"--- CODE SOURCE ---\n"
                     f"```python\n{code_content}\n```\n\n"
                     f"--- RAPPORT PYLINT ---\n"
-                    f"{pylint_report}\n\n"
-                    "Génère un plan de refactoring détaillé basé sur :\n"
-                    "1. Les problèmes identifiés par Pylint\n"
-                    "2. Les bugs logiques potentiels que tu détectes dans le code\n"
-                    "3. Les problèmes de sécurité (division par zéro, fichiers non fermés, etc.)\n"
-                    "4. Les violations des bonnes pratiques Python"
+                    f"{pylint_report}"
                 )
 
                 # 4. Construire le prompt complet (system + user)
@@ -76,17 +97,39 @@ class AuditorAgent:
                 # 5. Appel au modèle Gemini
                 response = self.model.generate_content(
                     full_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                temperature=0.2, # Un peu plus bas pour être plus concis et stable
-                max_output_tokens=8192, # Augmenté pour éviter les coupures
-                top_p=0.95,           # Ajouté pour meilleure cohérence
-                    )
+                    generation_config={
+                        "temperature": 0.2, # Un peu plus bas pour être plus concis et stable
+                        "max_output_tokens": 8192, # Augmenté pour éviter les coupures
+                        "top_p": 0.95,           # Ajouté pour meilleure cohérence
+                    },
+                    stream=report_file is not None
                 )
 
-                refactoring_plan = response.text.strip()
+                if report_file is None:
+                    refactoring_plan = response.text.strip()
+                else:
+                    # Le rapport s'écrit pendant la génération : pas d'attente de
+                    # la réponse complète puis d'écriture séparée
+                    # Comme .strip() : les blancs de début sont ignorés et ceux de
+                    # fin ne sont écrits que si du texte les suit
+                    chunks = []
+                    pending = ""
+                    written = False
+                    with atomic_open(report_file) as f:
+                        for chunk in response:
+                            text = chunk.text
+                            chunks.append(text)
+                            body = text.rstrip()
+                            if body:
+                                f.write(pending + body if written else body.lstrip())
+                                written = True
+                                pending = text[len(body):]
+                            else:
+                                pending += text
+                    refactoring_plan = "".join(chunks).strip()
 
                 # 6. Logging strict
-                log_experiment(
+                buffered_log_experiment(
                     agent_name=self.name,
                     model_used=self.model_name,
                     action=ActionType.ANALYSIS,
@@ -94,7 +137,8 @@ class AuditorAgent:
                     details={
                         "file_path": file_path,
                         "code_length": len(code_content),
-                        "pylint_report": pylint_report,
+                        # Extrait seulement : le rapport complet figure déjà dans input_prompt
+                        "pylint_report": pylint_report[:500] + ("..." if len(pylint_report) > 500 else ""),
                         "input_prompt": user_content,
                         "output_response": refactoring_plan
                     }
@@ -104,7 +148,7 @@ class AuditorAgent:
 
             except Exception as error:
                 # Logging même en cas d'échec
-                log_experiment(
+                buffered_log_experiment(
                     agent_name=self.name,
                     model_used=self.model_name,
                     action=ActionType.ANALYSIS,
@@ -116,4 +160,106 @@ class AuditorAgent:
                         "error_type": type(error).__name__
                     }
                 )
-                return f"Erreur Auditeur : {error}"
\ No newline at end of file
+                error_plan = f"Erreur Auditeur : {error}"
+                if report_file is not None:
+                    atomic_write(report_file, error_plan)
+                return error_plan
+
+    def audit_batch(self, file_paths: List[str],
+                    contents: Optional[Dict[str, str]] = None,
+                    pylint_reports: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Analyse plusieurs petits fichiers en une seule requête au modèle.
+
+        Les fichiers sont concaténés (séparés par `### FILE: <nom> ###`) et le
+        modèle renvoie un objet JSON {nom_du_fichier: plan}. Les fichiers absents
+        de la réponse ne figurent pas dans le résultat : l'appelant doit les
+        auditer individuellement avec audit().
+
+        Args:
+            file_paths: Chemins vers les fichiers Python à analyser
+            contents: Code source déjà en mémoire, par chemin (évite de relire les fichiers)
+            pylint_reports: Rapports Pylint déjà calculés, par chemin
+
+        Returns:
+            Dictionnaire {chemin du fichier: plan de refactoring en Markdown}
+        """
+        paths_by_name = {Path(path).name: path for path in file_paths}
+        contents = contents or {}
+        pylint_reports = pylint_reports or {}
+
+        try:
+            # 1. Code source + rapport Pylint de chaque fichier, délimités par nom
+            sections = [
+                f"\n\n### FILE: {name} ###\n\n"
+                f"--- CODE SOURCE ---\n"
+                f"```python\n{contents[path] if path in contents else read_file(path)}\n```\n\n"
+                f"--- RAPPORT PYLINT ---\n"
+                f"{pylint_reports[path] if path in pylint_reports else run_pylint(path)}"
+                for name, path in paths_by_name.items()
+            ]
+
+            user_content = (
+                f"{AUDIT_INSTRUCTIONS}\n\n"
+                "Fais-le POUR CHAQUE FICHIER ci-dessous. Retourne UNIQUEMENT un objet JSON "
+                "dont les clés sont les noms de fichiers et les valeurs le plan de "
+                "refactoring (Markdown) de ce fichier.\n\n"
+                "FILE CONTENT:"
+                + "".join(sections)
+            )
+
+            full_prompt = f"{self.system_prompt}\n\n{user_content}"
+
+            # 2. Un seul appel au modèle pour tout le lot
+            response = self.model.generate_content(
+                full_prompt,
+                generation_config={
+                    "temperature": 0.2,
+                    "max_output_tokens": 8192,
+                    "top_p": 0.95,
+                }
+            )
+
+            cleaned = response.text.strip()
+            if cleaned.startswith("```"):
+                cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else ""
+            if cleaned.endswith("```"):
+                cleaned = cleaned[:-3]
+            plans = json.loads(cleaned)
+
+            # 3. Ne garder que les plans des fichiers demandés
+            results = {
+                paths_by_name[name]: plan.strip()
+                for name, plan in plans.items()
+                if name in paths_by_name and isinstance(plan, str) and plan.strip()
+            }
+
+            buffered_log_experiment(
+                agent_name=self.name,
+                model_used=self.model_name,
+                action=ActionType.ANALYSIS,
+                status="SUCCESS",
+                details={
+                    "file_paths": list(paths_by_name.values()),
+                    "files_audited": len(results),
+                    "input_prompt": user_content,
+                    "output_response": response.text
+                }
+            )
+
+            return results
+
+        except Exception as error:
+            buffered_log_experiment(
+                agent_name=self.name,
+                model_used=self.model_name,
+                action=ActionType.ANALYSIS,
+                status="FAILURE",
+                details={
+                    "input_prompt": "BATCH AUDIT FAILED BEFORE PROMPT COMPLETION",
+                    "output_response": str(error),
+                    "file_paths": list(paths_by_name.values()),
+                    "error_type": type(error).__name__
+                }
+            )
+            return {}
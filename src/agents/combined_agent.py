@@ -0,0 +1,155 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.agents.auditor_agent import AUDIT_INSTRUCTIONS, DEFAULT_MODEL
+from src.utils.tools import run_pylint, read_file, load_prompt, atomic_write, strip_code_fence
+from src.utils.logger import buffered_log_experiment, ActionType
+from src.utils.gemini_client import get_model
+
+load_dotenv()
+
+# Consignes fixes placées avant le contenu variable (cache de préfixe du fournisseur)
+COMBINED_INSTRUCTIONS = (
+    f"{AUDIT_INSTRUCTIONS}\n\n"
+    "Puis corrige le code en appliquant ce plan.\n"
+    "Retourne UNIQUEMENT un objet JSON de la forme "
+    '{"plan": "<plan de refactoring en Markdown>", '
+    '"fixed_code": "<code Python corrigé complet>"}'
+)
+
+
+class CombinedAgent:
+    """
+    Agent Auditeur + Fixateur en un seul appel au modèle :
+    - Reçoit le code et le rapport Pylint une seule fois
+    - Retourne le plan de refactoring ET le code corrigé
+    - Divise par deux le nombre de requêtes par fichier
+
+    En cas de réponse inexploitable, l'appelant se rabat sur
+    AuditorAgent puis FixateurAgent.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        """
+        Initialise l'agent combiné avec un modèle Gemini.
+
+        Args:
+            model_name: Le nom du modèle Gemini à utiliser.
+        """
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise EnvironmentError("GOOGLE_API_KEY manquante dans le fichier .env")
+
+        # Modèle Gemini partagé entre agents (une seule configuration, client réutilisé)
+        self.model = get_model(api_key, model_name)
+
+        self.name = "CombinedAgent"
+        self.model_name = model_name
+        self.system_prompt = (
+            f"{load_prompt('auditor_system.txt')}\n\n{load_prompt('fixateur_system.txt')}"
+        )
+
+    def audit_and_fix(self, file_path: str, content: Optional[str] = None,
+                      pylint_report: Optional[str] = None,
+                      report_file: Optional[Path] = None) -> dict:
+        """
+        Audite et corrige un fichier Python en une seule requête.
+
+        Args:
+            file_path: Chemin vers le fichier Python à corriger
+            content: Code source déjà en mémoire (évite de relire le fichier)
+            pylint_report: Rapport Pylint déjà calculé (ex: run_pylint_batch)
+            report_file: Fichier où écrire le plan de refactoring
+
+        Returns:
+            dict avec "status", et en cas de succès "plan" et "fixed_code"
+        """
+        user_content = ""
+        try:
+            # 1. Code source et analyse statique
+            code_content = content if content is not None else read_file(file_path)
+            if pylint_report is None:
+                pylint_report = run_pylint(file_path)
+
+            user_content = (
+                f"{COMBINED_INSTRUCTIONS}\n\n"
+                "FILE CONTENT:\n"
+                f"Fichier analysé : {file_path}\n\n"
+                f"--- CODE SOURCE ---\n"
+                f"```python\n{code_content}\n```\n\n"
+                f"--- RAPPORT PYLINT ---\n"
+                f"{pylint_report}"
+            )
+
+            full_prompt = f"{self.system_prompt}\n\n{user_content}"
+
+            # 2. Un seul appel pour l'audit et la correction
+            response = self.model.generate_content(
+                full_prompt,
+                generation_config={
+                    "temperature": 0.2,
+                    "max_output_tokens": 8192,
+                    "top_p": 0.95,
+                }
+            )
+
+            cleaned = response.text.strip()
+            if cleaned.startswith("```"):
+                cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else ""
+            if cleaned.endswith("```"):
+                cleaned = cleaned[:-3]
+            answer = json.loads(cleaned)
+
+            plan = answer.get("plan")
+            fixed_code = answer.get("fixed_code")
+            if not isinstance(plan, str) or not isinstance(fixed_code, str) or not fixed_code.strip():
+                raise ValueError("Réponse JSON incomplète (plan ou fixed_code manquant)")
+
+            # Le code peut lui-même être entouré de balises markdown
+            fixed_code = strip_code_fence(fixed_code.strip()).strip()
+            plan = plan.strip()
+
+            # 3. Écrire le rapport puis écraser le fichier avec le code corrigé
+            if report_file is not None:
+                atomic_write(report_file, plan)
+            atomic_write(file_path, fixed_code)
+
+            buffered_log_experiment(
+                agent_name=self.name,
+                model_used=self.model_name,
+                action=ActionType.FIX,
+                status="SUCCESS",
+                details={
+                    "file_path": file_path,
+                    "code_length_before": len(code_content),
+                    "code_length_after": len(fixed_code),
+                    "input_prompt": user_content,
+                    "output_response": response.text
+                }
+            )
+
+            return {
+                "status": "success",
+                "file_path": file_path,
+                "plan": plan,
+                "fixed_code": fixed_code,
+            }
+
+        except Exception as error:
+            buffered_log_experiment(
+                agent_name=self.name,
+                model_used=self.model_name,
+                action=ActionType.FIX,
+                status="FAILURE",
+                details={
+                    "file_path": file_path,
+                    "input_prompt": user_content or "AUDIT+FIX FAILED BEFORE PROMPT COMPLETION",
+                    "output_response": str(error),
+                    "error_type": type(error).__name__
+                }
+            )
+            return {"status": "error", "message": f"Erreur Agent combiné : {error}"}
@@ -1,14 +1,32 @@
 import os
 from pathlib import Path
-import google.generativeai as genai
+from typing import List, Optional
 from dotenv import load_dotenv
-from src.utils.logger import log_experiment, ActionType
+from src.utils.logger import buffered_log_experiment, ActionType
+from src.utils.gemini_client import get_model
+from src.utils.console import BANNER, log
+from src.utils.tools import (
+    load_prompt, apply_unified_diff, atomic_write, budget_source, strip_code_fence
+)
 
 load_dotenv()
 
 # Définition de modèle,remarque si vous trouverez de problèmes de quota remplacez gemini-2.5-flash par gemma-3-27b-it
 DEFAULT_MODEL = "gemma-3-27b-it"  
 
+# Consigne fixe, placée avant le contenu variable (cache de préfixe du fournisseur)
+FIX_INSTRUCTIONS = "Retourne UNIQUEMENT le code Python corrigé, sans explications supplémentaires."
+
+# Au-delà de cette taille, on demande un diff unifié : le modèle ne réécrit
+# plus les lignes inchangées (moins de jetons de sortie, pas de troncature)
+DIFF_MIN_LINES = 150
+# Au-delà (~100k tokens), seul le voisinage des lignes signalées est envoyé
+SOURCE_MAX_CHARS = 400_000
+DIFF_INSTRUCTIONS = (
+    "Retourne UNIQUEMENT un diff unifié (format diff --git, hunks @@ avec lignes "
+    "de contexte) qui applique les corrections au fichier, sans explications supplémentaires."
+)
+
 
 class FixateurAgent:
     """
@@ -29,14 +47,13 @@ class FixateurAgent:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY n'est pas définie dans les variables d'environnement")
         
-        # Configuration Gemini
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name=self.model_name)
+        # Modèle Gemini partagé entre agents (une seule configuration, client réutilisé)
+        self.model = get_model(api_key, self.model_name)
         
         # Charger le prompt système
         self.system_prompt = self._load_system_prompt()
         
-        print(f"✓ Fixateur Agent initialisé avec le modèle : {self.model_name}")
+        log.info(f"✓ Fixateur Agent initialisé avec le modèle : {self.model_name}")
     
     def _load_system_prompt(self) -> str:
         """
@@ -45,37 +62,50 @@ class FixateurAgent:
         Returns:
             Le contenu du prompt système
         """
-        prompt_file = Path("prompts/fixateur_system.txt")
-        
-        if not prompt_file.exists():
-            raise FileNotFoundError(f"Fichier prompt non trouvé : {prompt_file}")
-        
-        with open(prompt_file, "r", encoding="utf-8") as f:
-            return f.read()
+        return load_prompt("fixateur_system.txt")
     
-    def fix(self, file_path: str) -> dict:
+    def _generate(self, user_content: str) -> str:
+        """Envoie le prompt (system + user) au modèle et retourne le texte brut."""
+        full_prompt = f"{self.system_prompt}\n\n{user_content}"
+        response = self.model.generate_content(
+            full_prompt,
+            generation_config={
+                "temperature": 0.2,
+                "max_output_tokens": 8192,
+                "top_p": 0.95,
+            }
+        )
+        return response.text
+
+    def fix(self, file_path: str, incremental_errors: Optional[List[dict]] = None,
+            content: Optional[str] = None) -> dict:
         """
         Corrige un fichier Python bugué en utilisant son rapport d'audit.
         
         Args:
             file_path: Chemin vers le fichier Python à corriger
+            incremental_errors: Erreurs bloquantes du dernier test (self-healing).
+                Si fourni, seules ces erreurs sont envoyées au modèle au lieu
+                du rapport d'audit complet : prompt beaucoup plus court.
+            content: Code source déjà en mémoire (évite de relire le fichier)
             
         Returns:
             dict contenant les informations sur la correction
         """
-        print(f"\n{'='*70}")
-        print(f"🔧 CORRECTION DE : {Path(file_path).name}")
-        print(f"{'='*70}")
+        log.info(f"\n{BANNER}\n🔧 CORRECTION DE : {Path(file_path).name}\n{BANNER}")
         
         # 1. Lire le code bugué
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                buggy_code = f.read()
-            print(f"✓ Code bugué chargé ({len(buggy_code)} caractères)")
+            if content is not None:
+                buggy_code = content
+            else:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    buggy_code = f.read()
+            log.info(f"✓ Code bugué chargé ({len(buggy_code)} caractères)")
         except Exception as e:
             error_msg = f"Erreur lors de la lecture du fichier : {str(e)}"
-            print(f"✗ {error_msg}")
-            log_experiment(
+            log.warning(f"✗ {error_msg}")
+            buffered_log_experiment(
                 agent_name="FixateurAgent",
                 model_used=self.model_name,
                 action=ActionType.ANALYSIS,
@@ -88,95 +118,129 @@ class FixateurAgent:
             )
             return {"status": "error", "message": error_msg}
         
-        # 2. Lire le rapport d'audit correspondant
+        # 2. Lire le rapport d'audit correspondant (inutile en mode incrémental)
         audit_file = Path("audit_reports") / f"{Path(file_path).stem}_audit.txt"
-        
-        if not audit_file.exists():
-            error_msg = f"Rapport d'audit non trouvé : {audit_file}"
-            print(f"✗ {error_msg}")
-            log_experiment(
-                agent_name="FixateurAgent",
-                model_used=self.model_name,
-                action=ActionType.ANALYSIS,
-                details={
-                    "file_path": file_path,
-                    "audit_file": str(audit_file),
-                    "input_prompt": "Lecture du rapport d'audit",
-                    "output_response": error_msg
-                },
-                status="FAILURE"
+
+        if incremental_errors:
+            log.info(f"✓ Mode incrémental : {len(incremental_errors)} erreur(s) à corriger")
+        else:
+            # Pas de exists() préalable : l'ouverture suffit à détecter l'absence
+            try:
+                with open(audit_file, "r", encoding="utf-8") as f:
+                    audit_report = f.read()
+                log.info(f"✓ Rapport d'audit chargé ({len(audit_report)} caractères)")
+            except Exception as e:
+                if isinstance(e, FileNotFoundError):
+                    error_msg = f"Rapport d'audit non trouvé : {audit_file}"
+                else:
+                    error_msg = f"Erreur lors de la lecture du rapport d'audit : {str(e)}"
+                log.warning(f"✗ {error_msg}")
+                buffered_log_experiment(
+                    agent_name="FixateurAgent",
+                    model_used=self.model_name,
+                    action=ActionType.ANALYSIS,
+                    details={
+                        "file_path": file_path,
+                        "audit_file": str(audit_file),
+                        "input_prompt": "Lecture du rapport d'audit",
+                        "output_response": error_msg
+                    },
+                    status="FAILURE"
+                )
+                return {"status": "error", "message": error_msg}
+
+        # 3. Construire le prompt utilisateur
+        if incremental_errors:
+            errors_text = "\n".join(
+                f"- Ligne {error.get('line', 'N/A')} [{error.get('type', 'Unknown')}] : "
+                f"{error.get('description', '')} → {error.get('suggestion', '')}"
+                for error in incremental_errors
             )
-            return {"status": "error", "message": error_msg}
-        
-        try:
-            with open(audit_file, "r", encoding="utf-8") as f:
-                audit_report = f.read()
-            print(f"✓ Rapport d'audit chargé ({len(audit_report)} caractères)")
-        except Exception as e:
-            error_msg = f"Erreur lors de la lecture du rapport d'audit : {str(e)}"
-            print(f"✗ {error_msg}")
-            log_experiment(
+            instructions = (
+                f"ERREURS BLOQUANTES DÉTECTÉES PAR LE TESTEUR :\n{errors_text}\n\n"
+                "Applique UNIQUEMENT ces corrections."
+            )
+        else:
+            instructions = (
+                f"RAPPORT D'AUDIT :\n{audit_report}\n\n"
+                "Corrige ce code en suivant les recommandations du rapport d'audit."
+            )
+
+        # Fichier trop gros pour le contexte : on n'envoie que les zones signalées
+        prompt_code = budget_source(buggy_code, instructions, SOURCE_MAX_CHARS)
+        if prompt_code is None:
+            error_msg = (
+                f"Fichier trop volumineux ({len(buggy_code)} caractères) "
+                "et aucune ligne citée par le rapport"
+            )
+            log.warning(f"✗ {error_msg}")
+            buffered_log_experiment(
                 agent_name="FixateurAgent",
                 model_used=self.model_name,
                 action=ActionType.ANALYSIS,
                 details={
                     "file_path": file_path,
-                    "audit_file": str(audit_file),
-                    "input_prompt": "Lecture du rapport d'audit",
+                    "input_prompt": "Réduction du code source",
                     "output_response": error_msg
                 },
                 status="FAILURE"
             )
             return {"status": "error", "message": error_msg}
-        
-        # 3. Construire le prompt utilisateur
-        user_content = f"""
-FICHIER À CORRIGER : {Path(file_path).name}
+        truncated = prompt_code is not buggy_code
+        if truncated:
+            log.info(f"✂️  Code réduit aux zones signalées ({len(prompt_code)} caractères envoyés)")
 
-CODE BUGUÉ :
-```python
-{buggy_code}
-```
-
-RAPPORT D'AUDIT :
-{audit_report}
-
-Corrige ce code en suivant les recommandations du rapport d'audit.
-Retourne UNIQUEMENT le code Python corrigé, sans explications supplémentaires.
-"""
+        # Consigne fixe d'abord, puis uniquement ce qui varie (nom, code, erreurs) :
+        # le début du prompt reste identique d'un fichier à l'autre
+        file_block = (
+            "FILE CONTENT:\n"
+            f"FICHIER À CORRIGER : {Path(file_path).name}\n\n"
+            "CODE BUGUÉ :\n"
+            f"```python\n{prompt_code}\n```\n\n"
+            f"{instructions}\n"
+        )
+        mode = "diff" if truncated or buggy_code.count("\n") + 1 >= DIFF_MIN_LINES else "full"
+        user_content = (
+            f"{DIFF_INSTRUCTIONS if mode == 'diff' else FIX_INSTRUCTIONS}\n\n{file_block}"
+        )
         
-        print(f"✓ Prompt construit")
-        print(f"📤 Envoi de la requête à Gemini {self.model_name}...")
+        log.info(f"✓ Prompt construit")
+        log.info(f"📤 Envoi de la requête à Gemini {self.model_name}...")
         
         # 4. Appeler Gemini pour obtenir le code corrigé
         try:
-            # Construire le prompt complet (system + user)
-            full_prompt = f"{self.system_prompt}\n\n{user_content}"
-            
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.2,
-                    max_output_tokens=8192,
-                    top_p=0.95,
-                )
-            )
-            
-            fixed_code = response.text.strip()
-            print(f"✓ Code corrigé reçu ({len(fixed_code)} caractères)")
-            
-            # Nettoyer le code (enlever les balises markdown si présentes)
-            if "```python" in fixed_code:
-                fixed_code = fixed_code.split("```python")[1].split("```")[0].strip()
-            elif "```" in fixed_code:
-                fixed_code = fixed_code.split("```")[1].split("```")[0].strip()
+            fixed_code = None
+
+            if mode == "diff":
+                diff_text = self._generate(user_content).strip()
+                log.info(f"✓ Diff reçu ({len(diff_text)} caractères)")
+                diff_text = strip_code_fence(diff_text)
+                fixed_code = apply_unified_diff(buggy_code, diff_text)
+                if fixed_code is None and truncated:
+                    # Le modèle n'a vu qu'un extrait : impossible de réécrire le fichier entier
+                    raise ValueError("Diff inapplicable sur un fichier tronqué")
+                if fixed_code is None:
+                    # Diff inapplicable : réécriture complète comme avant
+                    log.warning("⚠️  Diff inapplicable, repli sur le code complet")
+                    mode = "full"
+                    user_content = f"{FIX_INSTRUCTIONS}\n\n{file_block}"
+                else:
+                    fixed_code = fixed_code.strip()
+                    log.info(f"✓ Diff appliqué")
+
+            if fixed_code is None:
+                fixed_code = self._generate(user_content).strip()
+                log.info(f"✓ Code corrigé reçu ({len(fixed_code)} caractères)")
+
+                # Nettoyer le code (enlever les balises markdown si présentes)
+                fixed_code = strip_code_fence(fixed_code).strip()
             
-            print(f"✓ Code nettoyé")
+            log.info(f"✓ Code nettoyé")
             
         except Exception as e:
             error_msg = f"Erreur lors de l'appel à Gemini : {str(e)}"
-            print(f"✗ {error_msg}")
-            log_experiment(
+            log.warning(f"✗ {error_msg}")
+            buffered_log_experiment(
                 agent_name="FixateurAgent",
                 model_used=self.model_name,
                 action=ActionType.ANALYSIS,
@@ -192,11 +256,10 @@ Retourne UNIQUEMENT le code Python corrigé, sans explications supplémentaires.
         
         # 5. Écraser l'ancien fichier avec le code corrigé
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(fixed_code)
-            print(f"✓ Fichier écrasé avec le code corrigé : {file_path}")
+            atomic_write(file_path, fixed_code)
+            log.info(f"✓ Fichier écrasé avec le code corrigé : {file_path}")
             
-            log_experiment(
+            buffered_log_experiment(
                 agent_name="FixateurAgent",
                 model_used=self.model_name,
                 action=ActionType.ANALYSIS,
@@ -206,7 +269,9 @@ Retourne UNIQUEMENT le code Python corrigé, sans explications supplémentaires.
                     "input_prompt": user_content[:500] + "...",
                     "output_response": f"Code corrigé avec succès ({len(fixed_code)} caractères)",
                     "code_length_before": len(buggy_code),
-                    "code_length_after": len(fixed_code)
+                    "code_length_after": len(fixed_code),
+                    "mode": mode,
+                    "truncated": truncated
                 },
                 status="SUCCESS"
             )
@@ -221,8 +286,8 @@ Retourne UNIQUEMENT le code Python corrigé, sans explications supplémentaires.
             
         except Exception as e:
             error_msg = f"Erreur lors de l'écriture du fichier corrigé : {str(e)}"
-            print(f"✗ {error_msg}")
-            log_experiment(
+            log.warning(f"✗ {error_msg}")
+            buffered_log_experiment(
                 agent_name="FixateurAgent",
                 model_used=self.model_name,
                 action=ActionType.ANALYSIS,
@@ -1,11 +1,53 @@
+import atexit
 import json
+import re
 import subprocess
 import sys
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional
 from datetime import datetime
 import os
 
+from src.utils.gemini_client import get_model
+from src.utils.console import BANNER, log
+from src.utils.tools import load_prompt, dumps_json, loads_json, load_source
+
+
+# Format de réponse attendu : texte fixe, placé avant le code pour que le début
+# du prompt soit identique d'un fichier à l'autre (cache de préfixe du fournisseur).
+# Le chemin et l'horodatage réels sont ajoutés par l'agent, pas par le modèle.
+TEST_INSTRUCTIONS = """Retourne UNIQUEMENT un JSON avec cette structure :
+{
+    "file": "<chemin du fichier analysé>",
+    "verdict": "OK – exécution valide" OU "ERREUR BLOQUANTE – correction requise",
+    "blocking_errors": [
+        {
+            "line": 10,
+            "type": "SyntaxError",
+            "description": "Description précise",
+            "suggestion": "Action concrète"
+        }
+    ],
+    "non_blocking_improvements": [
+        {
+            "type": "Style",
+            "description": "Amélioration optionnelle",
+            "suggestion": "Suggestion"
+        }
+    ],
+    "tests_generated": [
+        {
+            "test_name": "test_function_name",
+            "test_code": "def test_function_name():\\n    assert fonction(2) == 4"
+        }
+    ]
+}"""
+
+
+# Objet JSON de la réponse, avec ou sans balises ```json (une seule passe)
+_JSON_FENCE_RE = re.compile(r"\A\s*(?:```(?:json)?\s*)?(\{.*\})\s*(?:```)?\s*\Z", re.DOTALL)
+
 
 class AgentTesteur:
     """
@@ -18,17 +60,22 @@ class AgentTesteur:
     - "ERREUR BLOQUANTE – correction requise" → Self-healing activé
     """
     DEFAULT_MODEL = "gemma-3-27b-it"   
+    MAX_LOGS_IN_MEMORY = 1024
     
-    def __init__(self, log_file: str = "test_logs.json", model_name: str = DEFAULT_MODEL):
+    def __init__(self, log_file: str = "test_logs.jsonl", model_name: str = DEFAULT_MODEL):
         """
         Initialise l'Agent Testeur.
         
         Args:
-            log_file: Nom du fichier de logs JSON
+            log_file: Nom du fichier de logs JSON Lines (une entrée par ligne)
             model_name: Modèle Gemini à utiliser
         """
         self.log_file = Path(log_file)
-        self.logs: List[Dict] = []
+        # Seules les entrées récentes restent en mémoire : l'historique complet est dans log_file
+        self.logs: Deque[Dict] = deque(maxlen=self.MAX_LOGS_IN_MEMORY)
+        # Fichier de logs ouvert une seule fois (tampon de 256 Kio), vidé à la fermeture
+        self._log_fp = None
+        atexit.register(self.close)
         self.error_log_file = Path("log_erreurs.json")
         self.model_name = model_name
         
@@ -37,17 +84,15 @@ class AgentTesteur:
         
         # Configuration Gemini
         try:
-            import google.generativeai as genai
             api_key = os.getenv("GOOGLE_API_KEY")
             if api_key:
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel(model_name=self.model_name)
-                print(f"✓ Agent Testeur initialisé avec le modèle : {self.model_name}")
+                self.model = get_model(api_key, self.model_name)
+                log.info(f"✓ Agent Testeur initialisé avec le modèle : {self.model_name}")
             else:
-                print("⚠️  GOOGLE_API_KEY non définie - mode simulation")
+                log.warning("⚠️  GOOGLE_API_KEY non définie - mode simulation")
                 self.model = None
         except ImportError:
-            print("⚠️  google.generativeai non installé - mode simulation")
+            log.warning("⚠️  google.generativeai non installé - mode simulation")
             self.model = None
     
     def _load_system_prompt(self) -> str:
@@ -57,34 +102,31 @@ class AgentTesteur:
         Returns:
             Le contenu du prompt système COMPLET
         """
-        prompt_file = Path("prompts/testeur_system.txt")
+        content = load_prompt("testeur_system.txt")
         
-        if not prompt_file.exists():
-            raise FileNotFoundError(f"Fichier prompt non trouvé : {prompt_file}")
-        
-        with open(prompt_file, "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        print(f"✓ Prompt système chargé depuis {prompt_file}")
+        log.info("✓ Prompt système chargé depuis prompts/testeur_system.txt")
         return content
     
-    def test_with_llm(self, code_file_path: str) -> Dict:
+    def test_with_llm(self, code_file_path: str, content: Optional[str] = None) -> Dict:
         """
         Teste le code avec Gemini en utilisant le prompt système.
         
         Args:
             code_file_path: Chemin du fichier Python à tester
+            content: Code source déjà en mémoire (évite de relire le fichier)
             
         Returns:
             Dictionnaire avec résultats et verdict
         """
-        print(f"\n🤖 [TESTEUR] Analyse du code: '{code_file_path}'")
+        log.info(f"\n🤖 [TESTEUR] Analyse du code: '{code_file_path}'")
         
         # 1. Lire le fichier de code
         try:
-            with open(code_file_path, 'r', encoding='utf-8') as f:
-                code_content = f.read()
-            print(f"  ✓ Code lu ({len(code_content)} caractères)")
+            if content is not None:
+                code_content = content
+            else:
+                _, code_content = load_source(code_file_path)
+            log.info(f"  ✓ Code lu ({len(code_content)} caractères)")
         except Exception as e:
             error_msg = f"Impossible de lire le fichier: {e}"
             return {
@@ -93,47 +135,19 @@ class AgentTesteur:
                 "verdict": "ERREUR BLOQUANTE – correction requise"
             }
         
-        # 2. Construire le prompt COMPLET (système + code)
-        full_prompt = f"""{self.system_prompt}
-
-FICHIER À ANALYSER : {code_file_path}
-
-CODE:
-```python
-{code_content}
-```
-
-Retourne UNIQUEMENT un JSON avec cette structure :
-{{
-    "file": "{code_file_path}",
-    "timestamp": "{datetime.now().isoformat()}",
-    "verdict": "OK – exécution valide" OU "ERREUR BLOQUANTE – correction requise",
-    "blocking_errors": [
-        {{
-            "line": 10,
-            "type": "SyntaxError",
-            "description": "Description précise",
-            "suggestion": "Action concrète"
-        }}
-    ],
-    "non_blocking_improvements": [
-        {{
-            "type": "Style",
-            "description": "Amélioration optionnelle",
-            "suggestion": "Suggestion"
-        }}
-    ],
-    "tests_generated": [
-        {{
-            "test_name": "test_function_name",
-            "test_code": "def test_function_name():\\n    assert fonction(2) == 4"
-        }}
-    ]
-}}
-"""
+        # 2. Construire le prompt COMPLET : partie fixe (système + format de
+        #    réponse) d'abord, puis uniquement ce qui varie (chemin, code)
+        full_prompt = (
+            f"{self.system_prompt}\n\n"
+            f"{TEST_INSTRUCTIONS}\n\n"
+            "FILE CONTENT:\n"
+            f"FICHIER À ANALYSER : {code_file_path}\n\n"
+            "CODE:\n"
+            f"```python\n{code_content}\n```\n"
+        )
         
         # 3. Appeler Gemini
-        print("  📤 Envoi à Gemini...")
+        log.info("  📤 Envoi à Gemini...")
         gemini_response = self._call_gemini_api(full_prompt)
         
         if not gemini_response:
@@ -143,7 +157,7 @@ Retourne UNIQUEMENT un JSON avec cette structure :
                 "verdict": "ERREUR BLOQUANTE – correction requise"
             }
         
-        print("  📥 Réponse reçue")
+        log.info("  📥 Réponse reçue")
         
         # 4. Parser la réponse
         analysis = self._parse_gemini_response(gemini_response)
@@ -154,10 +168,14 @@ Retourne UNIQUEMENT un JSON avec cette structure :
         # 6. Déterminer succès
         success = "OK" in verdict and "exécution valide" in verdict
         
+        # Un seul horodatage pour tout le cycle (log_erreurs.json, logs du test et de la validation)
+        timestamp = datetime.now().isoformat()
+
         # 7. Générer log_erreurs.json seulement si erreurs bloquantes
-        error_log_generated = False
+        error_log = None
         if not success:
-            error_log_generated = self._generate_error_log_file(analysis, code_file_path)
+            error_log = self._generate_error_log_file(analysis, code_file_path, timestamp)
+        error_log_generated = error_log is not None
         
         # 8. Logger
         self._log_test_run(
@@ -165,15 +183,18 @@ Retourne UNIQUEMENT un JSON avec cette structure :
             test_path=code_file_path,
             analysis=analysis,
             error_log_file=str(self.error_log_file) if error_log_generated else None,
-            verdict=verdict
+            verdict=verdict,
+            timestamp=timestamp
         )
         
         # 9. Retourner
         return {
             "success": success,
             "verdict": verdict,
+            "timestamp": timestamp,
             "analysis": analysis,
             "error_log_file": str(self.error_log_file) if error_log_generated else None,
+            "error_log": error_log,
             "blocking_errors": analysis.get('blocking_errors', []),
             "non_blocking_improvements": analysis.get('non_blocking_improvements', []),
             "tests_generated": analysis.get('tests_generated', [])
@@ -183,7 +204,7 @@ Retourne UNIQUEMENT un JSON avec cette structure :
         """Appelle l'API Gemini avec le prompt complet."""
         try:
             if not self.model:
-                print("  ⚠️  Mode simulation activé")
+                log.warning("  ⚠️  Mode simulation activé")
                 return self._simulate_gemini_response()
             
             response = self.model.generate_content(
@@ -198,7 +219,7 @@ Retourne UNIQUEMENT un JSON avec cette structure :
             return response.text
             
         except Exception as e:
-            print(f"  ⚠️  Erreur API Gemini: {e}, simulation...")
+            log.warning(f"  ⚠️  Erreur API Gemini: {e}, simulation...")
             return self._simulate_gemini_response()
     
     def _simulate_gemini_response(self) -> str:
@@ -234,29 +255,23 @@ Retourne UNIQUEMENT un JSON avec cette structure :
         """Parse la réponse JSON de Gemini."""
         try:
             # Nettoyer la réponse
-            cleaned = response.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
+            match = _JSON_FENCE_RE.search(response)
+            cleaned = match.group(1) if match else response
             
             # Parser
-            analysis = json.loads(cleaned)
+            analysis = loads_json(cleaned)
             
             verdict = analysis.get('verdict', 'ERREUR BLOQUANTE – correction requise')
             blocking_count = len(analysis.get('blocking_errors', []))
             
-            print(f"  ✓ Analyse parsée")
-            print(f"  ✓ Verdict: {verdict}")
-            print(f"  ✓ Erreurs bloquantes: {blocking_count}")
+            log.info(f"  ✓ Analyse parsée")
+            log.info(f"  ✓ Verdict: {verdict}")
+            log.info(f"  ✓ Erreurs bloquantes: {blocking_count}")
             
             return analysis
             
         except json.JSONDecodeError as e:
-            print(f"  ❌ Erreur de parsing JSON: {e}")
+            log.warning(f"  ❌ Erreur de parsing JSON: {e}")
             return {
                 "file": "unknown",
                 "verdict": "ERREUR BLOQUANTE – correction requise",
@@ -270,11 +285,17 @@ Retourne UNIQUEMENT un JSON avec cette structure :
                 "tests_generated": []
             }
     
-    def _generate_error_log_file(self, analysis: Dict, code_file: str) -> bool:
-        """Génère log_erreurs.json pour le Fixateur."""
+    def _generate_error_log_file(self, analysis: Dict, code_file: str,
+                                 timestamp: Optional[str] = None) -> Optional[Dict]:
+        """
+        Génère log_erreurs.json pour le Fixateur.
+
+        Returns:
+            Le contenu écrit (pour éviter de relire le fichier), ou None en cas d'échec
+        """
         try:
             error_log = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp or datetime.now().isoformat(),
                 "agent": "Testeur",
                 "code_file": code_file,
                 "verdict": analysis.get('verdict', 'ERREUR BLOQUANTE – correction requise'),
@@ -283,15 +304,15 @@ Retourne UNIQUEMENT un JSON avec cette structure :
                 "tests_generated": analysis.get('tests_generated', [])
             }
             
-            with open(self.error_log_file, 'w', encoding='utf-8') as f:
-                json.dump(error_log, f, indent=2, ensure_ascii=False)
+            # Fichier lu par des programmes : JSON compact
+            self.error_log_file.write_bytes(dumps_json(error_log))
             
-            print(f"  ✓ log_erreurs.json généré")
-            return True
+            log.info(f"  ✓ log_erreurs.json généré")
+            return error_log
             
         except Exception as e:
-            print(f"  ❌ Erreur génération log_erreurs.json: {e}")
-            return False
+            log.warning(f"  ❌ Erreur génération log_erreurs.json: {e}")
+            return None
     
     def _log_test_run(
         self,
@@ -299,11 +320,12 @@ Retourne UNIQUEMENT un JSON avec cette structure :
         test_path: str,
         analysis: Dict,
         error_log_file: Optional[str] = None,
-        verdict: str = ""
+        verdict: str = "",
+        timestamp: Optional[str] = None
     ):
         """Enregistre une exécution de test dans les logs."""
         log_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp or datetime.now().isoformat(),
             "agent": "Testeur",
             "success": success,
             "test_path": test_path,
@@ -317,20 +339,39 @@ Retourne UNIQUEMENT un JSON avec cette structure :
         self._save_logs()
     
     def _save_logs(self):
-        """Sauvegarde les logs dans le fichier JSON."""
+        """
+        Ajoute la dernière entrée au fichier JSON Lines.
+
+        Une ligne par entrée : le coût d'écriture ne dépend plus du nombre
+        d'entrées déjà enregistrées (plus de réécriture complète du fichier).
+        """
+        if not self.logs:
+            return
         try:
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(self.logs, f, indent=2, ensure_ascii=False)
+            if self._log_fp is None:
+                self._log_fp = open(self.log_file, 'ab', buffering=256 * 1024)
+            self._log_fp.write(dumps_json(self.logs[-1]) + b"\n")
         except Exception as e:
-            print(f"  ⚠️  Erreur sauvegarde logs: {e}")
-    
+            log.warning(f"  ⚠️  Erreur sauvegarde logs: {e}")
+
+    def flush(self):
+        """Écrit sur disque les entrées en attente dans le tampon (un seul write)."""
+        if self._log_fp is not None:
+            self._log_fp.flush()
+
+    def close(self):
+        """Vide le tampon et ferme le fichier de logs (rouvert à la prochaine entrée)."""
+        if self._log_fp is not None:
+            self._log_fp.close()
+            self._log_fp = None
+
     def validate_mission(self, results: Dict) -> Dict:
         """Valide si la mission est réussie ou nécessite retour au Fixateur."""
         verdict = results.get('verdict', 'ERREUR BLOQUANTE – correction requise')
         success = results.get('success', False)
         
         if success:
-            print("\n✅ [TESTEUR] Verdict : OK – exécution valide")
+            log.info("\n✅ [TESTEUR] Verdict : OK – exécution valide")
             
             validation = {
                 "status": "SUCCESS",
@@ -339,11 +380,11 @@ Retourne UNIQUEMENT un JSON avec cette structure :
                 "verdict": verdict
             }
             
-            self._log_validation(validation)
+            self._log_validation(validation, results.get("timestamp"))
             return validation
         
         else:
-            print("\n❌ [TESTEUR] Verdict : ERREUR BLOQUANTE – correction requise")
+            log.warning("\n❌ [TESTEUR] Verdict : ERREUR BLOQUANTE – correction requise")
             
             validation = {
                 "status": "FAILED",
@@ -354,13 +395,13 @@ Retourne UNIQUEMENT un JSON avec cette structure :
                 "blocking_errors": results.get("blocking_errors", [])
             }
             
-            self._log_validation(validation)
+            self._log_validation(validation, results.get("timestamp"))
             return validation
     
-    def _log_validation(self, validation: Dict):
+    def _log_validation(self, validation: Dict, timestamp: Optional[str] = None):
         """Enregistre la validation dans les logs."""
         log_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp or datetime.now().isoformat(),
             "agent": "Testeur",
             "action": "Validation",
             "validation": validation
@@ -369,51 +410,63 @@ Retourne UNIQUEMENT un JSON avec cette structure :
         self.logs.append(log_entry)
         self._save_logs()
     
-    def run_full_test_cycle(self, target_path: str) -> Dict:
+    def run_full_test_cycle(self, target_path: str, content: Optional[str] = None) -> Dict:
         """
         Exécute un cycle complet de test.
         
         Args:
             target_path: Fichier .py à tester
+            content: Code source déjà en mémoire (évite de relire le fichier)
             
         Returns:
-            Résultat de la validation
+            Résultat de la validation (avec "error_log" : contenu de
+            log_erreurs.json en cas d'erreurs bloquantes, sinon None)
         """
-        print("\n" + "="*70)
-        print("🧪 AGENT TESTEUR - Cycle de test")
-        print("="*70)
+        log.info(f"\n{BANNER}\n🧪 AGENT TESTEUR - Cycle de test\n{BANNER}")
         
         # Tester avec Gemini
-        results = self.test_with_llm(target_path)
+        results = self.test_with_llm(target_path, content=content)
         
         # Valider
         validation = self.validate_mission(results)
         
+        # Contenu de log_erreurs.json déjà en mémoire : l'appelant n'a pas à le relire
+        validation["error_log"] = results.get("error_log")
+        
         # Résumé
         self._print_summary(validation)
+
+        # Les deux entrées du cycle (test + validation) partent en une seule écriture
+        self.flush()
         
         return validation
     
     def _print_summary(self, validation: Dict):
         """Affiche un résumé de la validation."""
-        print("\n" + "="*70)
-        print("📊 RÉSUMÉ")
-        print("="*70)
-        print(f"Verdict: {validation['verdict']}")
-        print(f"Action: {validation['next_action']}")
+        lines = [
+            f"\n{BANNER}",
+            "📊 RÉSUMÉ",
+            BANNER,
+            f"Verdict: {validation['verdict']}",
+            f"Action: {validation['next_action']}",
+        ]
         
         if 'error_log_file' in validation and validation['error_log_file']:
-            print(f"Fichier erreurs: {validation['error_log_file']}")
+            lines.append(f"Fichier erreurs: {validation['error_log_file']}")
         if 'blocking_errors' in validation:
-            print(f"Erreurs bloquantes: {len(validation['blocking_errors'])}")
+            lines.append(f"Erreurs bloquantes: {len(validation['blocking_errors'])}")
         
-        print("="*70)
+        lines.append(BANNER)
+        # Un seul enregistrement : le bloc n'est pas entrecoupé par les autres workers
+        log.info("\n".join(lines))
     
     def get_logs(self) -> List[Dict]:
-        """Retourne tous les logs."""
-        return self.logs
+        """Retourne les logs récents (MAX_LOGS_IN_MEMORY au plus ; tout est dans log_file)."""
+        return list(self.logs)
     
     def clear_logs(self):
-        """Efface tous les logs."""
-        self.logs = []
-        self._save_logs()
\ No newline at end of file
+        """Efface tous les logs (historique en mémoire et fichier JSON Lines)."""
+        # Le fichier est fermé d'abord : son tampon ne doit pas être écrit après la troncature
+        self.close()
+        self.logs.clear()
+        self.log_file.write_text("", encoding="utf-8")
\ No newline at end of file
@@ -10,13 +10,17 @@ import json
 from src.agents.auditor_agent import AuditorAgent
 from src.agents.fixateur_agent import FixateurAgent
 from src.agents.testeur_agent import AgentTesteur
-from src.utils.logger import log_experiment, ActionType
+from src.utils.logger import buffered_log_experiment, ActionType
+from src.utils.cache import cache_load, cache_path, cache_store
+from src.utils.tools import atomic_write, list_python_files, pylint_version
+from src.utils.console import BANNER, RULE, log
 
 
 class RefactoringState(TypedDict):
     """État du système."""
     target_dir: str
     current_file: str
+    source: str  # Code courant du fichier, lu une seule fois puis suivi en mémoire
     file_list: List[str]
     current_index: int
     iteration_count: int
@@ -40,7 +44,7 @@ class Orchestrator:
         # Construire le graphe
         self.graph = self._build_graph()
         
-        print("✓ Orchestrateur LangGraph initialisé")
+        log.info("✓ Orchestrateur LangGraph initialisé")
     
     def _build_graph(self):
         """Construit le graphe d'exécution."""
@@ -80,15 +84,11 @@ class Orchestrator:
     
     def _initialize(self, state: RefactoringState) -> RefactoringState:
         """Initialise le système."""
-        print(f"\n{'='*70}")
-        print("🚀 INITIALISATION")
-        print(f"{'='*70}")
+        log.info(f"\n{BANNER}\n🚀 INITIALISATION\n{BANNER}")
         
-        target_path = Path(state["target_dir"])
-        python_files = list(target_path.glob("*.py"))
-        file_list = [str(f) for f in python_files]
+        file_list = [str(f) for f in list_python_files(state["target_dir"])]
         
-        print(f"📁 {len(file_list)} fichier(s) trouvé(s)")
+        log.info(f"📁 {len(file_list)} fichier(s) trouvé(s)")
         
         stats = {
             "total": len(file_list),
@@ -101,6 +101,7 @@ class Orchestrator:
         return {
             "target_dir": state["target_dir"],
             "current_file": "",
+            "source": "",
             "file_list": file_list,
             "current_index": 0,
             "iteration_count": 1,
@@ -119,13 +120,16 @@ class Orchestrator:
         
         current_file = file_list[current_index]
         
-        print(f"\n{'='*70}")
-        print(f"📁 FICHIER [{current_index + 1}/{len(file_list)}]: {Path(current_file).name}")
-        print(f"{'='*70}")
+        log.info(
+            f"\n{BANNER}\n"
+            f"📁 FICHIER [{current_index + 1}/{len(file_list)}]: {Path(current_file).name}\n"
+            f"{BANNER}"
+        )
         
         return {
             **state,
             "current_file": current_file,
+            "source": Path(current_file).read_text(encoding="utf-8"),
             "iteration_count": 1,
             "test_passed": False
         }
@@ -135,26 +139,35 @@ class Orchestrator:
         current_file = state["current_file"]
         iteration = state["iteration_count"]
         
-        print(f"\n📋 PHASE 1: AUDIT (Tentative {iteration}/{state['max_iterations']})")
-        print("-" * 70)
+        log.info(f"\n📋 PHASE 1: AUDIT (Tentative {iteration}/{state['max_iterations']})\n{RULE}")
         
         try:
-            audit_report = self.auditor.audit(current_file)
+            # Même cache disque que main.py : un fichier inchangé n'est pas ré-audité
+            entry = cache_path(
+                "audit", self.auditor.model_name, current_file,
+                self.auditor.system_prompt + pylint_version(), state["source"].encode("utf-8")
+            )
+            audit_report = cache_load(entry)
+            if audit_report is None:
+                audit_report = self.auditor.audit(current_file, content=state["source"])
+                if not audit_report.startswith("Erreur Auditeur"):
+                    cache_store(entry, audit_report)
+            else:
+                log.info(f"✓ Résultat audit en cache : {Path(current_file).name}")
             
             # Sauvegarder le rapport
             reports_dir = Path("audit_reports")
             reports_dir.mkdir(exist_ok=True)
             
             report_file = reports_dir / f"{Path(current_file).stem}_audit.txt"
-            with open(report_file, "w", encoding="utf-8") as f:
-                f.write(audit_report)
+            atomic_write(report_file, audit_report)
             
-            print(f"✓ Audit terminé - rapport sauvegardé: {report_file.name}")
+            log.info(f"✓ Audit terminé - rapport sauvegardé: {report_file.name}")
             
             return state
             
         except Exception as e:
-            print(f"✗ Erreur audit: {e}")
+            log.warning(f"✗ Erreur audit: {e}")
             return state
     
     def _fix(self, state: RefactoringState) -> RefactoringState:
@@ -163,23 +176,23 @@ class Orchestrator:
         iteration = state["iteration_count"]
         
         if iteration == 1:
-            print(f"\n🔧 PHASE 2: CORRECTION INITIALE")
+            log.info(f"\n🔧 PHASE 2: CORRECTION INITIALE\n{RULE}")
         else:
-            print(f"\n🔧 PHASE 2: RE-CORRECTION (Tentative {iteration})")
-        print("-" * 70)
+            log.info(f"\n🔧 PHASE 2: RE-CORRECTION (Tentative {iteration})\n{RULE}")
         
         try:
-            result = self.fixateur.fix(current_file)
+            result = self.fixateur.fix(current_file, content=state["source"])
             
             if result.get("status") == "success":
-                print(f"✓ Correction appliquée")
-            else:
-                print(f"✗ Correction échouée")
-            
+                log.info(f"✓ Correction appliquée")
+                # Le Fixateur vient d'écrire ce code : la copie en mémoire reste à jour
+                return {**state, "source": result["fixed_code"]}
+
+            log.warning(f"✗ Correction échouée")
             return state
             
         except Exception as e:
-            print(f"✗ Erreur correction: {e}")
+            log.warning(f"✗ Erreur correction: {e}")
             return state
     
     def _test(self, state: RefactoringState) -> RefactoringState:
@@ -187,12 +200,11 @@ class Orchestrator:
         current_file = state["current_file"]
         iteration = state["iteration_count"]
         
-        print(f"\n🧪 PHASE 3: TEST")
-        print("-" * 70)
+        log.info(f"\n🧪 PHASE 3: TEST\n{RULE}")
         
         try:
             # Exécuter le test
-            test_result = self.testeur.run_full_test_cycle(current_file)
+            test_result = self.testeur.run_full_test_cycle(current_file, content=state["source"])
             
             # Récupérer le verdict
             verdict = test_result.get("verdict", "")
@@ -201,13 +213,13 @@ class Orchestrator:
             # Détection du verdict OK
             if verdict and "OK" in verdict:
                 test_passed = True
-                print(f"  ✅ Verdict OK détecté: {verdict}")
+                log.info(f"  ✅ Verdict OK détecté: {verdict}")
             
             # Afficher le résultat
             if test_passed:
-                print(f"  ✅ Test réussi à l'itération {iteration}")
+                log.info(f"  ✅ Test réussi à l'itération {iteration}")
             else:
-                print(f"  ❌ Test échoué à l'itération {iteration} (verdict: {verdict})")
+                log.warning(f"  ❌ Test échoué à l'itération {iteration} (verdict: {verdict})")
             
             return {
                 **state,
@@ -215,7 +227,7 @@ class Orchestrator:
             }
             
         except Exception as e:
-            print(f"✗ Erreur test: {e}")
+            log.warning(f"✗ Erreur test: {e}")
             return {
                 **state,
                 "test_passed": False
@@ -230,7 +242,7 @@ class Orchestrator:
             stats["processed"] += 1
             stats["success"] += 1
             stats["total_iterations"] += state["iteration_count"]
-            print(f"\n✅ Succès enregistré après {state['iteration_count']} tentative(s)")
+            log.info(f"\n✅ Succès enregistré après {state['iteration_count']} tentative(s)")
             
             return {
                 **state,
@@ -240,11 +252,11 @@ class Orchestrator:
         else:
             # Incrémenter le compteur d'itérations pour le même fichier
             next_iteration = state["iteration_count"] + 1
-            print(f"\n❌ Échec, prochaine tentative: {next_iteration}")
+            log.warning(f"\n❌ Échec, prochaine tentative: {next_iteration}")
             
             # Vérifier si on a dépassé le max d'itérations
             if next_iteration > state["max_iterations"]:
-                print(f"\n❌ Maximum d'itérations atteint pour ce fichier")
+                log.warning(f"\n❌ Maximum d'itérations atteint pour ce fichier")
                 stats = state["stats"].copy()
                 stats["processed"] += 1
                 stats["failed"] += 1
@@ -273,11 +285,11 @@ class Orchestrator:
             
             # Vérifier s'il reste des fichiers
             if next_index >= len(state["file_list"]):
-                print(f"\n📌 Plus de fichiers à traiter")
+                log.info(f"\n📌 Plus de fichiers à traiter")
                 return "DONE"
             else:
                 # Mettre à jour l'index dans l'état
-                print(f"\n⏳ Passage au fichier suivant après {self.delay_between_files}s...")
+                log.info(f"\n⏳ Passage au fichier suivant après {self.delay_between_files}s...")
                 time.sleep(self.delay_between_files)
                 # On met à jour l'index ici
                 state["current_index"] = next_index
@@ -285,11 +297,11 @@ class Orchestrator:
         
         # Si l'itération courante a échoué mais pas dépassé le max, on réessaie
         if state["iteration_count"] <= state["max_iterations"]:
-            print(f"\n🔄 Nouvelle tentative sur le même fichier...")
+            log.info(f"\n🔄 Nouvelle tentative sur le même fichier...")
             return "RETRY"
         
         # Sinon, échec définitif, passer au suivant
-        print(f"\n❌ Échec définitif, passage au fichier suivant...")
+        log.warning(f"\n❌ Échec définitif, passage au fichier suivant...")
         next_index = state["current_index"] + 1
         if next_index >= len(state["file_list"]):
             return "DONE"
@@ -302,23 +314,26 @@ class Orchestrator:
         """Génère le rapport final."""
         stats = state["stats"]
         
-        print(f"\n{'='*70}")
-        print("📊 RAPPORT FINAL")
-        print(f"{'='*70}")
-        print(f"Fichiers trouvés : {stats['total']}")
-        print(f"Fichiers traités : {stats['processed']}")
-        print(f"✅ Succès : {stats['success']}")
-        print(f"❌ Échecs : {stats['failed']}")
-        print(f"📈 Total itérations : {stats['total_iterations']}")
+        lines = [
+            f"\n{BANNER}",
+            "📊 RAPPORT FINAL",
+            BANNER,
+            f"Fichiers trouvés : {stats['total']}",
+            f"Fichiers traités : {stats['processed']}",
+            f"✅ Succès : {stats['success']}",
+            f"❌ Échecs : {stats['failed']}",
+            f"📈 Total itérations : {stats['total_iterations']}",
+        ]
         
         if stats['processed'] > 0:
             avg = stats['total_iterations'] / stats['processed']
-            print(f"📊 Moyenne itérations/fichier : {avg:.1f}")
+            lines.append(f"📊 Moyenne itérations/fichier : {avg:.1f}")
         
-        print(f"{'='*70}")
+        lines.append(BANNER)
+        print("\n".join(lines))
         
         # Logger le rapport final
-        log_experiment(
+        buffered_log_experiment(
             agent_name="Orchestrator",
             model_used="N/A",
             action=ActionType.ANALYSIS,
@@ -337,6 +352,7 @@ class Orchestrator:
         initial_state = {
             "target_dir": target_dir,
             "current_file": "",
+            "source": "",
             "file_list": [],
             "current_index": 0,
             "iteration_count": 1,
@@ -356,15 +372,15 @@ class Orchestrator:
             stats = final_state["stats"]
             
             if stats["failed"] == 0:
-                print(f"\n✅ MISSION COMPLÈTE: Tous les fichiers validés!")
+                log.info(f"\n✅ MISSION COMPLÈTE: Tous les fichiers validés!")
                 return 0
             else:
-                print(f"\n⚠️ MISSION PARTIELLE: {stats['failed']} fichier(s) en échec")
+                log.warning(f"\n⚠️ MISSION PARTIELLE: {stats['failed']} fichier(s) en échec")
                 return 1
                 
         except Exception as e:
-            print(f"\n❌ ERREUR: {e}")
-            log_experiment(
+            log.warning(f"\n❌ ERREUR: {e}")
+            buffered_log_experiment(
                 agent_name="Orchestrator",
                 model_used="N/A",
                 action=ActionType.ANALYSIS,
@@ -0,0 +1,42 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+from src.utils.tools import dumps_json, read_json
+
+# Résultats des agents mémorisés sur disque, partagés par main.py et l'orchestrateur
+CACHE_DIR = Path(".cache")
+
+
+def cache_path(agent_name: str, model: str, file_path: str, extra: str = "",
+               source: Optional[bytes] = None) -> Path:
+    """Chemin du résultat en cache pour ce contenu de fichier, ce modèle et ce contexte."""
+    digest = hashlib.sha256(source if source is not None else Path(file_path).read_bytes())
+    digest.update(model.encode("utf-8"))
+    digest.update(extra.encode("utf-8"))
+    return CACHE_DIR / f"{agent_name}_{model}_{digest.hexdigest()}.json"
+
+
+def cache_load(cache_file: Path) -> Optional[Any]:
+    """
+    Lit une entrée du cache.
+
+    Returns:
+        Le résultat mémorisé, ou None si l'entrée est absente ou illisible
+        (elle sera alors recalculée puis réécrite)
+    """
+    try:
+        return read_json(cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def cache_store(cache_file: Path, result):
+    """Enregistre un résultat dans le cache (écriture atomique)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Fichier temporaire puis os.replace : une exécution interrompue ne laisse
+    # jamais d'entrée tronquée
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    tmp_file.write_bytes(dumps_json(result))
+    os.replace(tmp_file, cache_file)
@@ -0,0 +1,45 @@
+import logging
+import sys
+
+# Logger unique de l'affichage console (progression des agents et du pipeline)
+log = logging.getLogger("swarm")
+
+# Lignes de séparation de l'affichage (construites une seule fois)
+BANNER = "=" * 70
+RULE = "-" * 70
+
+
+class _NoSeparatorFilter(logging.Filter):
+    """
+    Écarte les lignes de séparation ("=" * 70, "-" * 70) en mode --quiet,
+    y compris à l'intérieur des messages multi-lignes (bannières groupées).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        lines = [line for line in message.split("\n") if line.strip("=- ") != "" or line == ""]
+        if len(lines) != message.count("\n") + 1:
+            record.msg, record.args = "\n".join(lines), ()
+        return record.getMessage().strip("=- \n") != ""
+
+
+def setup_console(verbose: bool = False, quiet: bool = False):
+    """
+    Configure l'affichage console du swarm.
+
+    Sans --verbose, seuls les avertissements et erreurs sont affichés : la
+    progression détaillée (bannières, lignes ✓ par fichier) n'est plus écrite
+    sur le terminal, ce qui évite des dizaines d'écritures par fichier en CI.
+
+    Args:
+        verbose: Affiche toute la progression (niveau INFO)
+        quiet: Supprime en plus les lignes de séparation
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    if quiet:
+        handler.addFilter(_NoSeparatorFilter())
+
+    log.handlers[:] = [handler]
+    log.setLevel(logging.INFO if verbose else logging.WARNING)
+    log.propagate = False
@@ -0,0 +1,27 @@
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def configure_gemini(api_key: str):
+    """
+    Configure le SDK Gemini une seule fois par processus et retourne le module.
+
+    genai.configure() remet à zéro les clients du SDK : appelé par chaque agent,
+    il jetait les connexions déjà ouvertes. Configuré une seule fois, tous les
+    GenerativeModel partagent le même client et ses connexions persistantes.
+    """
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai
+
+
+@functools.lru_cache(maxsize=None)
+def get_model(api_key: str, model_name: str):
+    """
+    Retourne le GenerativeModel partagé pour ce modèle.
+
+    Les agents utilisant le même modèle reçoivent la même instance : un seul
+    client (et un seul pool de connexions) pour tout le processus.
+    """
+    return configure_gemini(api_key).GenerativeModel(model_name=model_name)
@@ -1,12 +1,28 @@
-import json
+import atexit
 import os
+import threading
 import uuid
+from collections import deque
 from datetime import datetime
 from enum import Enum
 
+from src.utils.tools import dumps_json, loads_json
+
 # Chemin du fichier de logs
 LOG_FILE = os.path.join("logs", "experiment_data.json")
 
+# Intervalle (secondes) entre deux écritures des logs mis en tampon
+FLUSH_INTERVAL = 1.0
+# Au-delà de ce nombre d'entrées en attente, le tampon est écrit sans attendre
+MAX_BUFFERED = 100
+
+_buffer = deque()
+_write_lock = threading.Lock()
+_timer_lock = threading.Lock()
+_flush_timer = None
+# Entrées retenues au lieu d'être écrites (processus secondaires, voir start_capture)
+_captured = None
+
 class ActionType(str, Enum):
     """
     Énumération des types d'actions possibles pour standardiser l'analyse.
@@ -27,6 +43,101 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
         details (dict): Dictionnaire contenant les détails. DOIT contenir 'input_prompt' et 'output_response'.
         status (str): "SUCCESS" ou "FAILURE".
 
+    Raises:
+        ValueError: Si les champs obligatoires sont manquants dans 'details' ou si l'action est invalide.
+    """
+    entry = _build_entry(agent_name, model_used, action, details, status)
+    _write_entries([entry])
+
+
+def buffered_log_experiment(agent_name: str, model_used: str, action: ActionType, details: dict, status: str):
+    """
+    Comme log_experiment, mais l'entrée est gardée en mémoire et écrite avec
+    les autres lors du prochain flush() (au plus FLUSH_INTERVAL secondes plus
+    tard, dès MAX_BUFFERED entrées en attente, et à la sortie du programme) :
+    un seul accès disque par lot.
+
+    La validation est faite immédiatement : une entrée invalide lève ValueError ici.
+    """
+    _buffer.append(_build_entry(agent_name, model_used, action, details, status))
+    if len(_buffer) >= MAX_BUFFERED:
+        flush()
+    else:
+        _schedule_flush()
+
+
+def flush():
+    """Écrit en une seule fois toutes les entrées en attente."""
+    entries = []
+    # popleft est atomique : deux flush concurrents (timer, workers) se
+    # partagent les entrées, le perdant s'arrête sur le tampon vide
+    while True:
+        try:
+            entries.append(_buffer.popleft())
+        except IndexError:
+            break
+    if entries:
+        _write_entries(entries)
+
+
+def _schedule_flush():
+    """Programme un flush différé s'il n'y en a pas déjà un en attente."""
+    global _flush_timer
+    with _timer_lock:
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(FLUSH_INTERVAL, _timed_flush)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def _timed_flush():
+    global _flush_timer
+    with _timer_lock:
+        _flush_timer = None
+    flush()
+
+
+atexit.register(flush)
+
+
+def start_capture():
+    """
+    Retient les entrées en mémoire au lieu de les écrire dans LOG_FILE.
+
+    Utilisé par les processus secondaires (main.py --jobs) : un seul processus
+    doit réécrire le fichier de logs, sinon leurs écritures s'écrasent.
+
+    Le tampon hérité du parent (fork) est vidé : ces entrées appartiennent au
+    parent, qui les écrit lui-même. Le timer de flush n'est pas copié par le
+    fork, il est donc réinitialisé.
+    """
+    global _captured, _flush_timer
+    with _timer_lock:
+        _flush_timer = None
+    _buffer.clear()
+    with _write_lock:
+        _captured = []
+
+
+def stop_capture() -> list:
+    """Écrit les entrées en attente, arrête la capture et retourne les entrées retenues."""
+    global _captured
+    flush()
+    with _write_lock:
+        entries, _captured = _captured or [], None
+    return entries
+
+
+def write_entries(entries: list):
+    """Ajoute des entrées déjà construites (ex: retournées par stop_capture) au fichier de logs."""
+    if entries:
+        _write_entries(entries)
+
+
+def _build_entry(agent_name: str, model_used: str, action: ActionType, details: dict, status: str) -> dict:
+    """
+    Valide les paramètres et construit l'entrée de log (voir log_experiment).
+
     Raises:
         ValueError: Si les champs obligatoires sont manquants dans 'details' ou si l'action est invalide.
     """
@@ -69,21 +180,88 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
         "status": status
     }
 
-    # --- 4. LECTURE & ÉCRITURE ROBUSTE ---
-    data = []
-    if os.path.exists(LOG_FILE):
-        try:
-            with open(LOG_FILE, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content: # Vérifie que le fichier n'est pas juste vide
-                    data = json.loads(content)
-        except json.JSONDecodeError:
-            # Si le fichier est corrompu, on repart à zéro (ou on pourrait sauvegarder un backup)
-            print(f"⚠️ Attention : Le fichier de logs {LOG_FILE} était corrompu. Une nouvelle liste a été créée.")
-            data = []
-
-    data.append(entry)
-    
-    # Écriture
-    with open(LOG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
\ No newline at end of file
+    return entry
+
+
+def _format_entries(entries: list) -> bytes:
+    """Sérialise des entrées comme éléments d'un tableau JSON, une entrée par ligne."""
+    return b",\n".join(dumps_json(entry) for entry in entries)
+
+
+def _last_non_space(f, end: int) -> int:
+    """Position du dernier octet non blanc avant `end` (-1 s'il n'y en a pas)."""
+    while end > 0:
+        start = max(end - 4096, 0)
+        f.seek(start)
+        block = f.read(end - start)
+        stripped = block.rstrip()
+        if stripped:
+            return start + len(stripped) - 1
+        end = start
+    return -1
+
+
+def _append_in_place(entries: list) -> bool:
+    """
+    Ajoute les entrées à la fin du tableau JSON de LOG_FILE sans le relire :
+    seul le "]" final est remplacé. Le fichier reste un tableau JSON valide.
+
+    Returns:
+        False si la fin du fichier ne ressemble pas à un tableau JSON
+        (fichier absent, vide ou corrompu) : l'appelant le relit alors en entier.
+    """
+    try:
+        with open(LOG_FILE, "r+b") as f:
+            closing = _last_non_space(f, f.seek(0, os.SEEK_END))
+            if closing < 0:
+                return False
+            f.seek(closing)
+            if f.read(1) != b"]":
+                return False
+
+            last = _last_non_space(f, closing)
+            if last < 0:
+                return False
+            f.seek(last)
+            # Tableau vide ("[ ]") : pas de virgule avant la première entrée
+            separator = b"\n" if f.read(1) == b"[" else b",\n"
+
+            f.seek(last + 1)
+            f.truncate()
+            f.write(separator + _format_entries(entries) + b"\n]")
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _write_entries(entries: list):
+    """Ajoute des entrées au fichier de logs (en fin de tableau, sous verrou)."""
+    # Le verrou évite que deux threads (agents en parallèle, flush différé)
+    # écrivent la fin du fichier en même temps
+    with _write_lock:
+        if _captured is not None:
+            _captured.extend(entries)
+            return
+
+        # Cas courant : ajout en fin de fichier, coût proportionnel aux seules
+        # nouvelles entrées (plus de relecture/réécriture de tout l'historique)
+        if _append_in_place(entries):
+            return
+
+        # Fin de fichier inattendue : relecture complète avant de conclure à
+        # une corruption, pour ne jamais perdre d'entrées valides
+        data = []
+        if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) > 0:
+            try:
+                with open(LOG_FILE, "rb") as f:
+                    data = loads_json(f.read())
+                if not isinstance(data, list):
+                    raise ValueError("le fichier de logs n'est pas un tableau JSON")
+            except ValueError:
+                # Si le fichier est corrompu, on repart à zéro (ou on pourrait sauvegarder un backup)
+                print(f"⚠️ Attention : Le fichier de logs {LOG_FILE} était corrompu. Une nouvelle liste a été créée.")
+                data = []
+
+        data.extend(entries)
+        with open(LOG_FILE, "wb") as f:
+            f.write(b"[\n" + _format_entries(data) + b"\n]")
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import time
+
+# Les trois agents utilisent le même modèle : ~30 requêtes/min en tout sur le quota gratuit
+DEFAULT_RPM = 10
+
+
+class TokenBucket:
+    """
+    Limiteur de débit proactif (seau à jetons).
+
+    Le seau se remplit de `refill_rate` jetons par seconde jusqu'à `capacity`.
+    Chaque requête consomme des jetons ; on n'attend que si le seau est vide,
+    au lieu d'un délai fixe entre chaque fichier.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        """
+        Args:
+            capacity: Nombre maximum de jetons (taille de rafale autorisée)
+            refill_rate: Jetons ajoutés par seconde (0 = pas de limite)
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, agent_name: str, default_rpm: float = DEFAULT_RPM, workers: int = 1) -> "TokenBucket":
+        """
+        Crée un seau depuis la variable d'environnement `<AGENT>_RPM`
+        (requêtes par minute, ex: AUDITOR_RPM=10).
+
+        Le quota est celui de la clé API : avec plusieurs processus (`workers`),
+        chacun n'en reçoit qu'une part.
+        """
+        rpm = float(os.getenv(f"{agent_name.upper()}_RPM", default_rpm)) / max(workers, 1)
+        return cls(capacity=max(rpm, 1), refill_rate=rpm / 60)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.last_refill = now
+
+    async def acquire(self, cost: float = 1):
+        """Attend que `cost` jetons soient disponibles puis les consomme."""
+        if self.refill_rate <= 0:
+            return
+
+        async with self._lock:
+            self._refill()
+            if self.tokens < cost:
+                await asyncio.sleep((cost - self.tokens) / self.refill_rate)
+                self._refill()
+            self.tokens -= cost
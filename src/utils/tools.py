@@ -1,5 +1,17 @@
+import contextlib
+import functools
+import json
+import os
+import re
+import shutil
 import subprocess
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+try:
+    import orjson  # Parsing et sérialisation JSON en C, bien plus rapides ; optionnel
+except ImportError:
+    orjson = None
 
 
 def read_file(path: str) -> str:
@@ -9,14 +21,316 @@ def read_file(path: str) -> str:
     return Path(path).read_text(encoding="utf-8")
 
 
+def load_source(path: str) -> Tuple[bytes, str]:
+    """
+    Lit un fichier source une seule fois : octets bruts (clé de cache) et texte décodé.
+    """
+    data = Path(path).read_bytes()
+    return data, data.decode("utf-8", errors="replace")
+
+
+def loads_json(data) -> Any:
+    """
+    Parse du JSON depuis des bytes ou une str (orjson si disponible).
+
+    Les erreurs sont des json.JSONDecodeError dans les deux cas (orjson en dérive).
+    """
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def dumps_json(obj, pretty: bool = False) -> bytes:
+    """
+    Sérialise en JSON UTF-8 (orjson si disponible) : compact, ou indenté pour
+    une lecture humaine. Les clés non textuelles sont converties comme json.dumps.
+    """
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def read_json(path) -> Any:
+    """Charge un fichier JSON depuis ses octets, sans décodage en str intermédiaire."""
+    return loads_json(Path(path).read_bytes())
+
+
+@contextlib.contextmanager
+def atomic_open(path) -> Iterator[TextIO]:
+    """
+    Ouvre un fichier temporaire à côté de `path`, remplacé atomiquement à la fin.
+
+    Un arrêt en cours d'écriture laisse l'ancien fichier intact (jamais de
+    fichier source ou de rapport à moitié écrit) ; le gros tampon réduit les
+    appels système à quelques écritures par fichier.
+    """
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            yield f
+        if os.path.exists(path):
+            # Le fichier temporaire est créé avec les droits par défaut :
+            # on reprend ceux de l'original (ex: script exécutable)
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write(path, data: str) -> None:
+    """Écrit `data` dans `path` via atomic_open."""
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+@functools.lru_cache(maxsize=None)
+def load_prompt(name: str) -> str:
+    """
+    Lit un prompt système du dossier prompts/ (une seule lecture par processus).
+
+    Les prompts ne changent pas pendant une exécution : tous les agents et
+    workers partagent la même chaîne.
+    """
+    prompt_file = Path("prompts") / name
+    if not prompt_file.exists():
+        raise FileNotFoundError(f"Fichier prompt non trouvé : {prompt_file}")
+    return prompt_file.read_text(encoding="utf-8")
+
+
+def list_python_files(directory: str) -> List[Path]:
+    """
+    Liste les fichiers .py (non récursif) d'un dossier.
+
+    os.scandir lit le type de chaque entrée depuis le répertoire lui-même :
+    pas de stat ni de Path construit pour les fichiers qui ne sont pas .py.
+    """
+    with os.scandir(directory) as entries:
+        return [
+            Path(entry.path)
+            for entry in entries
+            if entry.name.endswith(".py") and entry.is_file(follow_symlinks=False)
+        ]
+
+
+# Rapport utilisé quand pylint n'est pas installé (l'audit continue sans analyse statique)
+PYLINT_MISSING = "Pylint non disponible (exécutable introuvable dans le PATH)."
+
+
+@functools.lru_cache(maxsize=None)
+def pylint_path() -> Optional[str]:
+    """Chemin de l'exécutable pylint, cherché une seule fois dans le PATH (None si absent)."""
+    return shutil.which("pylint")
+
+
 def run_pylint(file_path: str) -> str:
     """
     Exécute pylint sur un fichier Python et retourne le rapport texte.
     """
+    if pylint_path() is None:
+        return PYLINT_MISSING
+
     result = subprocess.run(
-        ["pylint", file_path, "--score=y"],
+        [pylint_path(), file_path, "--score=y"],
         capture_output=True,
         text=True
     )
 
     return result.stdout + result.stderr
+
+
+def run_pylint_batch(file_paths: List[str]) -> Dict[str, str]:
+    """
+    Exécute pylint une seule fois sur plusieurs fichiers (--jobs=0 : tous les
+    cœurs) et retourne un rapport texte par fichier.
+
+    Évite un démarrage d'interpréteur et un chargement de pylint par fichier.
+    Retourne un dictionnaire vide si la sortie JSON est inexploitable :
+    l'appelant se rabat alors sur run_pylint() fichier par fichier.
+    """
+    if not file_paths:
+        return {}
+    if pylint_path() is None:
+        return {path: PYLINT_MISSING for path in file_paths}
+
+    result = subprocess.run(
+        [pylint_path(), "--output-format=json", "--jobs=0", *file_paths],
+        capture_output=True,
+        text=True
+    )
+    try:
+        messages = loads_json(result.stdout)
+    except ValueError:
+        return {}
+
+    reports = {os.path.abspath(path): [] for path in file_paths}
+    for message in messages:
+        lines = reports.get(os.path.abspath(message.get("path", "")))
+        if lines is not None:
+            lines.append(
+                f"{message['path']}:{message['line']}:{message['column']}: "
+                f"{message['message-id']}: {message['message']} ({message['symbol']})"
+            )
+
+    return {
+        path: "\n".join(reports[os.path.abspath(path)]) or "Aucun message Pylint."
+        for path in file_paths
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def pylint_version() -> str:
+    """
+    Retourne la version de pylint (une seule exécution par processus).
+
+    Le rapport Pylint fait partie du prompt d'audit : un changement de version
+    doit invalider les audits mis en cache.
+    """
+    if pylint_path() is None:
+        return ""
+    try:
+        result = subprocess.run([pylint_path(), "--version"], capture_output=True, text=True)
+    except OSError:
+        return ""
+    return result.stdout.strip()
+
+
+# Bloc de code markdown (premier bloc uniquement). La fermeture est optionnelle :
+# une réponse coupée par max_output_tokens n'a pas de ``` final
+_CODE_FENCE_RE = re.compile(r"```(?:[\w+-]*[ \t]*\n)?(.*?)(?:\n?```|\Z)", re.DOTALL)
+
+
+def strip_code_fence(text: str) -> str:
+    """
+    Retire les balises markdown autour du code renvoyé par un modèle.
+
+    Returns:
+        Le contenu du premier bloc ``` (même non refermé), ou le texte
+        inchangé s'il n'en contient pas
+    """
+    match = _CODE_FENCE_RE.search(text)
+    return match.group(1) if match else text
+
+
+# Numéros de ligne cités dans un rapport : "Ligne 12", "line 12" ou "fichier.py:12:4:" (Pylint)
+_REPORT_LINE = re.compile(r"(?:[Ll]igne|[Ll]ine)\s*:?\s*(\d+)|\.py:(\d+):")
+
+
+def budget_source(source: str, report: str, max_chars: int,
+                  window: int = 20) -> Optional[str]:
+    """
+    Réduit un fichier trop gros aux zones citées par le rapport.
+
+    Si `source` tient dans `max_chars`, il est retourné tel quel. Sinon seules
+    les lignes à ±`window` autour des numéros de ligne du rapport sont gardées,
+    les autres étant remplacées par un marqueur "# ... lignes a-b omises ...".
+    Retourne None si le rapport ne cite aucune ligne exploitable.
+    """
+    if len(source) <= max_chars:
+        return source
+
+    lines = source.splitlines()
+    targets = sorted({
+        int(number) for match in _REPORT_LINE.findall(report) for number in match
+        if number and 1 <= int(number) <= len(lines)
+    })
+    if not targets:
+        return None
+
+    # Fenêtres fusionnées quand elles se chevauchent (indices 0-based, fin exclue)
+    ranges = []
+    for target in targets:
+        start, end = max(target - 1 - window, 0), min(target + window, len(lines))
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+
+    parts = []
+    position = 0
+    for start, end in ranges:
+        if start > position:
+            parts.append(f"# ... lignes {position + 1}-{start} omises ...")
+        parts.extend(lines[start:end])
+        position = end
+    if position < len(lines):
+        parts.append(f"# ... lignes {position + 1}-{len(lines)} omises ...")
+
+    return "\n".join(parts)
+
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+
+def apply_unified_diff(original: str, diff: str) -> Optional[str]:
+    """
+    Applique un diff unifié (un seul fichier) à un texte.
+
+    Chaque hunk est cherché à la ligne indiquée, ou à la position la plus
+    proche où son contexte correspond exactement (numéros de ligne approximatifs
+    tolérés). Retourne None si le diff ne contient aucun hunk, si une ligne
+    d'un hunk est illisible, si un hunk ne s'applique pas ou si le diff ne
+    change rien : l'appelant garde alors le comportement sans diff.
+    """
+    hunks = []
+    old_left = new_left = 0
+    for line in diff.splitlines():
+        if not old_left and not new_left:
+            # Hors hunk : en-têtes de fichier (---, +++, diff --git...) ignorés
+            header = _HUNK_HEADER.match(line)
+            if header:
+                old_left = int(header.group(2) or 1)
+                new_left = int(header.group(3) or 1)
+                hunks.append((int(header.group(1)), [], []))
+            continue
+
+        # Dans un hunk, les nombres de lignes de l'en-tête @@ distinguent
+        # "--- x" (ligne supprimée) d'un en-tête de fichier
+        old, new = hunks[-1][1], hunks[-1][2]
+        if line.startswith("\\"):
+            continue
+        elif line.startswith("-") and old_left:
+            old.append(line[1:])
+            old_left -= 1
+        elif line.startswith("+") and new_left:
+            new.append(line[1:])
+            new_left -= 1
+        elif (line.startswith(" ") or line == "") and old_left and new_left:
+            # Les modèles omettent souvent l'espace des lignes de contexte vides
+            old.append(line[1:])
+            new.append(line[1:])
+            old_left -= 1
+            new_left -= 1
+        else:
+            return None
+
+    if old_left or new_left:
+        if old_left != new_left:
+            return None
+        # Lignes de contexte vides finales perdues par un strip() de la réponse
+        hunks[-1][1].extend([""] * old_left)
+        hunks[-1][2].extend([""] * new_left)
+
+    if not hunks:
+        return None
+
+    lines = original.splitlines()
+    result = []
+    position = 0
+    for start, old, new in hunks:
+        expected = max(start - 1, position)
+        candidates = [
+            index for index in range(position, len(lines) - len(old) + 1)
+            if lines[index:index + len(old)] == old
+        ]
+        if not candidates:
+            return None
+        index = min(candidates, key=lambda i: abs(i - expected))
+        result.extend(lines[position:index])
+        result.extend(new)
+        position = index + len(old)
+    result.extend(lines[position:])
+
+    patched = "\n".join(result) + ("\n" if original.endswith("\n") else "")
+    return patched if patched != original else None